@@ -1,6 +1,7 @@
 {{
     config(
         materialized='table',
+        cluster_by=['h3_cell_r6', 'audit_status'],
         tags=['core', 'audit']
     )
 }}
@@ -54,6 +55,8 @@ select
     confidence,
     detected_lat,
     detected_lon,
+    -- Coarse (~36 km²) H3 cell: clustering key so bounding-box queries prune micro-partitions
+    h3_latlng_to_cell(detected_lat, detected_lon, 6) as h3_cell_r6,
     vehicle_id,
     recording_timestamp,
     detection_location,
@@ -4,11 +4,56 @@ GPS Coordinate Comparison Script
 Compares detected objects with OpenStreetMap ground truth data.
 """
 
+import io
 import math
 import csv
+import collections
 import xml.etree.ElementTree as ET
 from typing import List, Tuple, Dict
 
+import numpy as np
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:  # SciPy is optional; fall back to the brute-force scan
+    cKDTree = None
+
+try:
+    from lxml import etree as lxml_etree
+except ImportError:  # lxml is optional; fall back to xml.etree
+    lxml_etree = None
+
+# Errors raised for unreadable or malformed XML by the available parsers
+_XML_PARSE_ERRORS = (ET.ParseError,)
+if lxml_etree is not None:
+    _XML_PARSE_ERRORS += (lxml_etree.XMLSyntaxError,)
+
+try:
+    import numba
+except ImportError:  # Numba is optional; fall back to the NumPy distance matrix
+    numba = None
+
+
+# Approximate meters per degree of latitude (equirectangular projection)
+METERS_PER_DEGREE = 111320.0
+
+# Default spatial grid cell size in meters (2x the 15 m missing-sign threshold)
+GRID_CELL_SIZE_M = 30.0
+
+# Largest detected x OSM pair count handled with a dense distance matrix
+# before switching to the spatial grid (about 8 MB per float64 matrix)
+DENSE_MATRIX_MAX_PAIRS = 1_000_000
+
+# OSM element and attribute names, shared so the parse loop reuses one string object
+_NODE = 'node'
+_TAG = 'tag'
+_TOP_LEVEL_TAGS = ('node', 'way', 'relation')
+_ID = 'id'
+_LAT = 'lat'
+_LON = 'lon'
+_K = 'k'
+_V = 'v'
+
 
 def haversine_distance(lat1, lon1, lat2, lon2):
     """
@@ -18,26 +63,115 @@ def haversine_distance(lat1, lon1, lat2, lon2):
         lat1, lon1: Coordinates of first point in decimal degrees
         lat2, lon2: Coordinates of second point in decimal degrees
     
+    Returns:
+        Distance in meters
+    """
+    return _haversine_radians(math.radians(lat1), math.radians(lon1),
+                              math.radians(lat2), math.radians(lon2))
+
+
+def _haversine_radians(lat1_rad, lon1_rad, lat2_rad, lon2_rad):
+    """
+    Haversine distance for coordinates already converted to radians.
+    
+    Uses the asin form, which needs one sqrt and one asin instead of the
+    two sqrts and atan2 of the atan2 form.
+    
     Returns:
         Distance in meters
     """
     # Earth's radius in meters
     R = 6371000.0
     
-    # Convert to radians
-    lat1_rad = math.radians(lat1)
-    lat2_rad = math.radians(lat2)
-    delta_lat = math.radians(lat2 - lat1)
-    delta_lon = math.radians(lon2 - lon1)
+    s_dlat = math.sin((lat2_rad - lat1_rad) * 0.5)
+    s_dlon = math.sin((lon2_rad - lon1_rad) * 0.5)
+    a = s_dlat * s_dlat + math.cos(lat1_rad) * math.cos(lat2_rad) * s_dlon * s_dlon
+    
+    # Clamp against rounding pushing a slightly above 1 for antipodal points
+    return 2 * R * math.asin(math.sqrt(min(a, 1.0)))
+
+
+def haversine_vec(lats1, lons1, lats2, lons2):
+    """
+    Calculate great circle distances between two sets of points with NumPy.
+    
+    Args:
+        lats1, lons1: Arrays of N coordinates in decimal degrees
+        lats2, lons2: Arrays of M coordinates in decimal degrees
+    
+    Returns:
+        numpy array of shape (N, M) with distances in meters
+    """
+    lat1, lon1, cos_lat1 = _prepare_points(lats1, lons1)
+    lat2, lon2, cos_lat2 = _prepare_points(lats2, lons2)
+    return _haversine_elementwise(lat1[:, None], lon1[:, None], cos_lat1[:, None],
+                                  lat2[None, :], lon2[None, :], cos_lat2[None, :])
+
+
+def _prepare_points(lats, lons):
+    """
+    Convert degree arrays to radians and precompute cos(lat) once per point.
+    
+    Returns:
+        Tuple (lat_rad, lon_rad, cos_lat) of float64 arrays
+    """
+    lat_rad = np.radians(np.asarray(lats, dtype=np.float64))
+    lon_rad = np.radians(np.asarray(lons, dtype=np.float64))
+    return lat_rad, lon_rad, np.cos(lat_rad)
+
+
+def _haversine_elementwise(lat1, lon1, cos_lat1, lat2, lon2, cos_lat2):
+    """
+    Haversine distance in meters between broadcast-compatible radian arrays.
+    
+    Takes cos(lat) precomputed per point, so only the two half-angle sines
+    are evaluated per pair.
+    """
+    # Earth's radius in meters
+    R = 6371000.0
+    
+    s_dlat = np.sin((lat2 - lat1) * 0.5)
+    s_dlon = np.sin((lon2 - lon1) * 0.5)
+    a = s_dlat * s_dlat + cos_lat1 * cos_lat2 * s_dlon * s_dlon
+    return 2 * R * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def _prefiltered_haversine_matrix(lats1, lons1, lats2, lons2):
+    """
+    Haversine distance matrix that skips the trig for clearly distant pairs.
+    
+    Every pair is first screened with a flat-earth (equirectangular) distance,
+    which needs no trig per pair. The exact haversine is only evaluated for
+    pairs within twice the approximate nearest distance of their row or
+    column; all other entries are inf, which leaves the argmin along either
+    axis unchanged.
     
-    # Haversine formula
-    a = (math.sin(delta_lat / 2) ** 2 +
-         math.cos(lat1_rad) * math.cos(lat2_rad) *
-         math.sin(delta_lon / 2) ** 2)
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    Args:
+        lats1, lons1: Arrays of N coordinates in decimal degrees
+        lats2, lons2: Arrays of M coordinates in decimal degrees
     
-    distance = R * c
-    return distance
+    Returns:
+        numpy array of shape (N, M) with distances in meters (inf if skipped)
+    """
+    lat1, lon1, cos_lat1 = _prepare_points(lats1, lons1)
+    lat2, lon2, cos_lat2 = _prepare_points(lats2, lons2)
+    
+    # Scale longitude by the mean cosine of each pair's latitudes
+    meters_per_radian = METERS_PER_DEGREE * 180.0 / math.pi
+    dy = (lat2[None, :] - lat1[:, None]) * meters_per_radian
+    dx = ((lon2[None, :] - lon1[:, None]) * meters_per_radian *
+          (0.5 * (cos_lat1[:, None] + cos_lat2[None, :])))
+    approx_sq = dx * dx + dy * dy
+    
+    # Compare squared distances, so 2x the distance is 4x the square
+    candidates = ((approx_sq <= 4.0 * approx_sq.min(axis=1, keepdims=True)) |
+                  (approx_sq <= 4.0 * approx_sq.min(axis=0, keepdims=True)))
+    rows, cols = np.nonzero(candidates)
+    
+    dist_matrix = np.full(approx_sq.shape, np.inf)
+    dist_matrix[rows, cols] = _haversine_elementwise(lat1[rows], lon1[rows], cos_lat1[rows],
+                                                     lat2[cols], lon2[cols], cos_lat2[cols])
+    return dist_matrix
 
 
 def find_nearest(point, point_list):
@@ -46,20 +180,31 @@ def find_nearest(point, point_list):
     
     Args:
         point: Tuple (lat, lon) of the reference point
-        point_list: List of tuples [(lat, lon), ...]
+        point_list: List of tuples [(lat, lon), ...] or an (N, 2) array
     
     Returns:
         Tuple (nearest_point, distance, index)
     """
-    if not point_list:
+    if len(point_list) == 0:
         return None, float('inf'), -1
     
+    if isinstance(point_list, np.ndarray):
+        # Compute one row of distances and reduce it with argmin
+        dists = haversine_vec([point[0]], [point[1]], point_list[:, 0], point_list[:, 1])[0]
+        idx = int(dists.argmin())
+        return tuple(point_list[idx].tolist()), float(dists[idx]), idx
+    
     min_distance = float('inf')
     nearest_point = None
     nearest_index = -1
     
+    # Convert the reference point once rather than on every comparison
+    lat_rad = math.radians(point[0])
+    lon_rad = math.radians(point[1])
+    
     for idx, other_point in enumerate(point_list):
-        dist = haversine_distance(point[0], point[1], other_point[0], other_point[1])
+        dist = _haversine_radians(lat_rad, lon_rad,
+                                  math.radians(other_point[0]), math.radians(other_point[1]))
         if dist < min_distance:
             min_distance = dist
             nearest_point = other_point
@@ -68,128 +213,441 @@ def find_nearest(point, point_list):
     return nearest_point, min_distance, nearest_index
 
 
-def parse_osm_xml(osm_file_path, tag_key='highway', tag_value='traffic_signals'):
+def _to_local_xy(points, cos_ref_lat):
+    """
+    Project (lat, lon) points to local equirectangular meters.
+    
+    Args:
+        points: List of tuples [(lat, lon), ...]
+        cos_ref_lat: Cosine of the reference latitude used to scale longitude
+    
+    Returns:
+        numpy array of shape (N, 2) with (x, y) in meters
+    """
+    coords = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    xy = np.empty_like(coords)
+    xy[:, 0] = coords[:, 1] * METERS_PER_DEGREE * cos_ref_lat
+    xy[:, 1] = coords[:, 0] * METERS_PER_DEGREE
+    return xy
+
+
+if numba is not None:
+    @numba.njit(parallel=True, fastmath=True, cache=True)
+    def _nearest_haversine_kernel(lat1, lon1, lat2, lon2):
+        """Fused haversine + argmin over radian inputs, parallel over lat1."""
+        R = 6371000.0
+        n = lat1.shape[0]
+        m = lat2.shape[0]
+        out_dist = np.empty(n, dtype=np.float64)
+        out_idx = np.empty(n, dtype=np.int64)
+        cos_lat2 = np.cos(lat2)
+        
+        for i in numba.prange(n):
+            cos_lat1 = math.cos(lat1[i])
+            best_a = np.inf
+            best_j = -1
+            for j in range(m):
+                s_dlat = math.sin((lat2[j] - lat1[i]) * 0.5)
+                s_dlon = math.sin((lon2[j] - lon1[i]) * 0.5)
+                a = s_dlat * s_dlat + cos_lat1 * cos_lat2[j] * s_dlon * s_dlon
+                # Distance is monotonic in a, so defer the asin to the winner
+                if a < best_a:
+                    best_a = a
+                    best_j = j
+            out_dist[i] = 2 * R * math.asin(math.sqrt(min(best_a, 1.0)))
+            out_idx[i] = best_j
+        return out_dist, out_idx
+
+
+def nearest_neighbor_haversine(lats1, lons1, lats2, lons2):
+    """
+    Find the nearest (lats2, lons2) point for every (lats1, lons1) point.
+    
+    Runs a fused, parallel Numba kernel when Numba is installed, avoiding the
+    N x M temporaries of the NumPy path; otherwise reduces a prefiltered
+    haversine distance matrix.
+    
+    Args:
+        lats1, lons1: Arrays of N query coordinates in decimal degrees
+        lats2, lons2: Arrays of M candidate coordinates in decimal degrees
+    
+    Returns:
+        Tuple (distances, indices) of length-N arrays
+    """
+    if numba is None:
+        dist_matrix = _prefiltered_haversine_matrix(lats1, lons1, lats2, lons2)
+        indices = dist_matrix.argmin(axis=1)
+        return dist_matrix[np.arange(len(indices)), indices], indices
+    
+    return _nearest_haversine_kernel(
+        np.radians(np.asarray(lats1, dtype=np.float64)),
+        np.radians(np.asarray(lons1, dtype=np.float64)),
+        np.radians(np.asarray(lats2, dtype=np.float64)),
+        np.radians(np.asarray(lons2, dtype=np.float64))
+    )
+
+
+def _distance_matrix(points_a, points_b):
+    """Prefiltered haversine distance matrix of shape (len(points_a), len(points_b))."""
+    a = np.asarray(points_a, dtype=np.float64).reshape(-1, 2)
+    b = np.asarray(points_b, dtype=np.float64).reshape(-1, 2)
+    return _prefiltered_haversine_matrix(a[:, 0], a[:, 1], b[:, 0], b[:, 1])
+
+
+def _matches_from_matrix(dist_matrix, point_list, axis):
+    """
+    Reduce a distance matrix to nearest-neighbor matches along one axis.
+    
+    Args:
+        dist_matrix: Distance matrix from _distance_matrix
+        point_list: Points indexed by the reduced axis
+        axis: 1 to find the nearest column per row, 0 for the nearest row per column
+    
+    Returns:
+        List of tuples (nearest_point, distance, index)
+    """
+    indices = dist_matrix.argmin(axis=axis)
+    distances = np.take_along_axis(dist_matrix, np.expand_dims(indices, axis), axis=axis)
+    return [(point_list[idx], dist, idx)
+            for idx, dist in zip(indices.tolist(), distances.ravel().tolist())]
+
+
+def _ring_cells(cell_x, cell_y, ring):
+    """List the grid cells at Chebyshev distance ring from (cell_x, cell_y)."""
+    if ring == 0:
+        return [(cell_x, cell_y)]
+    
+    cells = []
+    for dx in range(-ring, ring + 1):
+        cells.append((cell_x + dx, cell_y - ring))
+        cells.append((cell_x + dx, cell_y + ring))
+    for dy in range(-ring + 1, ring):
+        cells.append((cell_x - ring, cell_y + dy))
+        cells.append((cell_x + ring, cell_y + dy))
+    return cells
+
+
+def _grid_nearest(query_xy, ref_xy, cell_size_m):
+    """
+    Nearest-neighbor indices from a uniform spatial hash grid.
+    
+    Reference points are bucketed by integer cell index. Each query searches
+    its own cell and the 8 around it; if the best candidate found there is
+    not provably the nearest (it is farther than one cell), that query falls
+    back to a NumPy scan over all reference points.
+    
+    Args:
+        query_xy: (N, 2) array of query points in local meters
+        ref_xy: (M, 2) array of reference points in local meters
+        cell_size_m: Grid cell edge length in meters
+    
+    Returns:
+        List of indices into ref_xy, one per query point
+    """
+    grid = collections.defaultdict(list)
+    ref_list = ref_xy.tolist()
+    for idx, (x, y) in enumerate(ref_list):
+        grid[(math.floor(x / cell_size_m), math.floor(y / cell_size_m))].append(idx)
+    
+    indices = []
+    for qx, qy in query_xy.tolist():
+        cell_x = math.floor(qx / cell_size_m)
+        cell_y = math.floor(qy / cell_size_m)
+        best_sq = float('inf')
+        best_idx = -1
+        
+        for ring in (0, 1):
+            for cell in _ring_cells(cell_x, cell_y, ring):
+                for idx in grid.get(cell, ()):
+                    dx = ref_list[idx][0] - qx
+                    dy = ref_list[idx][1] - qy
+                    dist_sq = dx * dx + dy * dy
+                    if dist_sq < best_sq:
+                        best_sq = dist_sq
+                        best_idx = idx
+        
+        # Anything outside the 3x3 block is at least one cell away
+        if best_sq > cell_size_m * cell_size_m:
+            best_idx = int(((ref_xy - (qx, qy)) ** 2).sum(axis=1).argmin())
+        indices.append(best_idx)
+    return indices
+
+
+def find_all_nearest(query_points, point_list, cell_size_m=GRID_CELL_SIZE_M):
+    """
+    Find the nearest point in point_list for every point in query_points.
+    
+    Builds a k-d tree over point_list once and queries all points in a single
+    call when SciPy is available. Otherwise uses nearest_neighbor_haversine
+    when Numba is installed or the dense distance matrix is small, and a
+    uniform spatial grid for larger inputs. The reported distance is always
+    the haversine distance.
+    
+    Args:
+        query_points: List of tuples [(lat, lon), ...]
+        point_list: List of tuples [(lat, lon), ...]
+        cell_size_m: Spatial grid cell size in meters (default: 30)
+    
+    Returns:
+        List of tuples (nearest_point, distance, index), one per query point
+    """
+    if len(query_points) == 0 or len(point_list) == 0:
+        return [find_nearest(point, point_list) for point in query_points]
+    
+    if cKDTree is None and (numba is not None or
+                            len(query_points) * len(point_list) <= DENSE_MATRIX_MAX_PAIRS):
+        query = np.asarray(query_points, dtype=np.float64).reshape(-1, 2)
+        ref = np.asarray(point_list, dtype=np.float64).reshape(-1, 2)
+        distances, indices = nearest_neighbor_haversine(query[:, 0], query[:, 1],
+                                                        ref[:, 0], ref[:, 1])
+        return [(point_list[idx], dist, idx)
+                for idx, dist in zip(indices.tolist(), distances.tolist())]
+    
+    # Project both sides around a shared reference latitude
+    mean_lat = (sum(p[0] for p in query_points) + sum(p[0] for p in point_list)) / \
+               (len(query_points) + len(point_list))
+    cos_ref_lat = math.cos(math.radians(mean_lat))
+    query_xy = _to_local_xy(query_points, cos_ref_lat)
+    ref_xy = _to_local_xy(point_list, cos_ref_lat)
+    
+    if cKDTree is not None:
+        tree = cKDTree(ref_xy, leafsize=16)
+        _, indices = tree.query(query_xy, k=1)
+        indices = indices.tolist()
+    else:
+        indices = _grid_nearest(query_xy, ref_xy, cell_size_m)
+    
+    matches = []
+    for point, idx in zip(query_points, indices):
+        nearest_point = point_list[idx]
+        distance = haversine_distance(point[0], point[1], nearest_point[0], nearest_point[1])
+        matches.append((nearest_point, distance, idx))
+    return matches
+
+
+def _iter_tagged_nodes_etree(osm_file_path, tag_key, tag_value):
+    """
+    Yield (node, value) for nodes carrying the requested tag using xml.etree.
+    
+    Streams the file instead of building the whole DOM, clearing the root
+    after each top-level element to keep memory flat.
+    """
+    context = ET.iterparse(osm_file_path, events=('start', 'end'))
+    _, root = next(context)
+    
+    for event, node in context:
+        if event != 'end' or node.tag not in _TOP_LEVEL_TAGS:
+            continue
+        
+        if node.tag == _NODE:
+            # Check if this node has the specified tag, iterating the
+            # children directly rather than building a findall() list
+            for tag in node:
+                if tag.tag != _TAG:
+                    continue
+                tag_attrs = tag.attrib
+                if tag_attrs.get(_K) != tag_key:
+                    continue
+                value = tag_attrs.get(_V)
+                if tag_value is not None and value != tag_value:
+                    continue
+                yield node, value
+                break  # Found matching tag, no need to check other tags
+        
+        root.clear()
+
+
+def _iter_tagged_nodes_lxml(osm_file_path, tag_key, tag_value):
+    """
+    Yield (node, value) for nodes carrying the requested tag using lxml.
+    
+    libxml2 filters the stream down to top-level elements and the tag
+    predicate is evaluated by a compiled XPath, so no Python-level loop
+    runs over the tag children.
+    """
+    if tag_value is None:
+        find_value = lxml_etree.XPath('tag[@k=$k][1]/@v')
+    else:
+        find_value = lxml_etree.XPath('tag[@k=$k and @v=$v][1]/@v')
+    
+    context = lxml_etree.iterparse(osm_file_path, events=('end',), tag=_TOP_LEVEL_TAGS)
+    for _, node in context:
+        if node.tag == _NODE:
+            values = find_value(node, k=tag_key, v=tag_value)
+            if values:
+                yield node, str(values[0])
+        
+        # Free the element and any already-processed siblings
+        node.clear()
+        while node.getprevious() is not None:
+            del node.getparent()[0]
+
+
+def parse_osm_xml(osm_file_path, tag_key='highway', tag_value='traffic_signals', as_arrays=False):
     """
     Parse an OSM XML file and extract nodes with specific tags.
     
+    Uses lxml when it is installed and falls back to xml.etree otherwise.
+    
     Args:
         osm_file_path: Path to the OSM XML file
         tag_key: The tag key to search for (default: 'highway')
         tag_value: The tag value to match (default: 'traffic_signals'). 
                    Use None to match any value for the tag_key.
+        as_arrays: If True, return columns as NumPy arrays instead of a list
+                   of dictionaries (default: False)
     
     Returns:
-        List of dictionaries with 'id', 'lat', 'lon' for each matching node
+        List of dictionaries with 'id', 'lat', 'lon' for each matching node,
+        or with as_arrays a dict mapping 'id', 'lat', 'lon' (and 'type' when
+        tag_value is None) to NumPy arrays
     """
-    nodes = []
+    if lxml_etree is not None:
+        iter_tagged_nodes = _iter_tagged_nodes_lxml
+    else:
+        iter_tagged_nodes = _iter_tagged_nodes_etree
+    
+    ids, lats, lons, types = [], [], [], []
     
     try:
-        tree = ET.parse(osm_file_path)
-        root = tree.getroot()
-        
-        # Find all node elements
-        for node in root.findall('.//node'):
-            # Check if this node has the specified tag
-            for tag in node.findall('tag'):
-                if tag_value is None:
-                    # Match any value for the tag_key
-                    if tag.get('k') == tag_key:
-                        node_data = {
-                            'id': node.get('id'),
-                            'lat': float(node.get('lat')),
-                            'lon': float(node.get('lon')),
-                            'type': tag.get('v')
-                        }
-                        nodes.append(node_data)
-                        break
-                else:
-                    # Match specific tag_key and tag_value
-                    if tag.get('k') == tag_key and tag.get('v') == tag_value:
-                        node_data = {
-                            'id': node.get('id'),
-                            'lat': float(node.get('lat')),
-                            'lon': float(node.get('lon'))
-                        }
-                        nodes.append(node_data)
-                        break  # Found matching tag, no need to check other tags
+        for node, value in iter_tagged_nodes(osm_file_path, tag_key, tag_value):
+            node_attrs = node.attrib
+            ids.append(node_attrs[_ID])
+            lats.append(float(node_attrs[_LAT]))
+            lons.append(float(node_attrs[_LON]))
+            types.append(value)
         
-    except Exception as e:
+    except (OSError,) + _XML_PARSE_ERRORS as e:
         print(f"Error parsing OSM file: {e}")
-        return []
-    
-    return nodes
+        ids, lats, lons, types = [], [], [], []
+    
+    if as_arrays:
+        columns = {
+            'id': np.asarray(ids, dtype=object),
+            'lat': np.asarray(lats, dtype=np.float64),
+            'lon': np.asarray(lons, dtype=np.float64)
+        }
+        if tag_value is None:
+            columns['type'] = np.asarray(types, dtype=object)
+        return columns
+    
+    if tag_value is None:
+        # Any value matched, so record which one
+        return [{'id': node_id, 'lat': lat, 'lon': lon, 'type': node_type}
+                for node_id, lat, lon, node_type in zip(ids, lats, lons, types)]
+    return [{'id': node_id, 'lat': lat, 'lon': lon}
+            for node_id, lat, lon in zip(ids, lats, lons)]
 
 
 def osm_nodes_to_coordinates(osm_nodes):
     """
-    Convert list of OSM node dictionaries to list of (lat, lon) tuples.
+    Convert OSM nodes to (lat, lon) coordinates.
     
     Args:
-        osm_nodes: List of dictionaries with 'lat' and 'lon' keys
+        osm_nodes: List of dictionaries with 'lat' and 'lon' keys, or the
+                   column dict returned by parse_osm_xml(..., as_arrays=True)
     
     Returns:
-        List of tuples [(lat, lon), ...]
+        List of tuples [(lat, lon), ...], or an (N, 2) array for column input
     """
+    if isinstance(osm_nodes, dict):
+        return np.column_stack((osm_nodes['lat'], osm_nodes['lon']))
     return [(node['lat'], node['lon']) for node in osm_nodes]
 
 
-def compare_gps_lists(detected_objects, osm_ground_truth, verify_threshold=10.0, missing_threshold=15.0):
+def compare_gps_iter(detected_objects, osm_ground_truth, verify_threshold=10.0, missing_threshold=15.0):
     """
-    Compare detected objects with OSM ground truth.
+    Compare detected objects with OSM ground truth, yielding each result as it is found.
+    
+    Results for detected objects come first, in input order, followed by the
+    missing OSM signs. compare_gps_lists groups them by status.
     
     Args:
-        detected_objects: List of tuples [(lat, lon), ...]
-        osm_ground_truth: List of tuples [(lat, lon), ...]
+        detected_objects: List of tuples [(lat, lon), ...] or an (N, 2) array
+        osm_ground_truth: List of tuples [(lat, lon), ...] or an (M, 2) array
         verify_threshold: Distance in meters to consider a match as verified (default: 10)
         missing_threshold: Distance in meters to search for missing signs (default: 15)
     
-    Returns:
-        Dict with 'verified', 'new_signs', and 'missing_signs' lists
+    Yields:
+        Tuples (status, record) where status is 'verified', 'new_signs' or
+        'missing_signs' and record is the matching compare_gps_lists entry
     """
-    results = {
-        'verified': [],
-        'new_signs': [],
-        'missing_signs': []
-    }
-    
-    # Track which OSM points have been matched
-    osm_matched = [False] * len(osm_ground_truth)
+    # Accept (N, 2) arrays as well as lists of tuples
+    if isinstance(detected_objects, np.ndarray):
+        detected_objects = [tuple(point) for point in detected_objects.tolist()]
+    if isinstance(osm_ground_truth, np.ndarray):
+        osm_ground_truth = [tuple(point) for point in osm_ground_truth.tolist()]
+    
+    num_pairs = len(detected_objects) * len(osm_ground_truth)
+    if cKDTree is None and numba is None and 0 < num_pairs <= DENSE_MATRIX_MAX_PAIRS:
+        # Without SciPy or Numba, compute the distance matrix once and reduce it in both directions
+        dist_matrix = _distance_matrix(detected_objects, osm_ground_truth)
+        nearest_osm_matches = _matches_from_matrix(dist_matrix, osm_ground_truth, axis=1)
+        nearest_det_matches = _matches_from_matrix(dist_matrix, detected_objects, axis=0)
+    else:
+        # Size grid cells so any match within either threshold is in the 3x3 search block
+        cell_size_m = 2 * max(verify_threshold, missing_threshold)
+        nearest_osm_matches = find_all_nearest(detected_objects, osm_ground_truth, cell_size_m)
+        nearest_det_matches = find_all_nearest(osm_ground_truth, detected_objects, cell_size_m)
     
     # Process each detected object
     for det_idx, detected_point in enumerate(detected_objects):
-        nearest_osm, distance, osm_idx = find_nearest(detected_point, osm_ground_truth)
+        nearest_osm, distance, osm_idx = nearest_osm_matches[det_idx]
         
         if distance < verify_threshold:
             # Verified match
-            results['verified'].append({
+            yield 'verified', {
                 'detected_point': detected_point,
                 'osm_point': nearest_osm,
                 'distance': distance,
                 'detected_index': det_idx,
                 'osm_index': osm_idx
-            })
-            osm_matched[osm_idx] = True
+            }
         else:
             # New sign detected
-            results['new_signs'].append({
+            yield 'new_signs', {
                 'detected_point': detected_point,
                 'nearest_osm': nearest_osm,
                 'distance': distance,
                 'detected_index': det_idx
-            })
+            }
     
     # Find missing signs (OSM points not matched within threshold)
     for osm_idx, osm_point in enumerate(osm_ground_truth):
         # Check if this OSM point has any detected object within missing_threshold
-        nearest_det, distance, det_idx = find_nearest(osm_point, detected_objects)
+        nearest_det, distance, det_idx = nearest_det_matches[osm_idx]
         
         if distance >= missing_threshold:
-            results['missing_signs'].append({
+            yield 'missing_signs', {
                 'osm_point': osm_point,
                 'nearest_detected': nearest_det,
                 'distance': distance,
                 'osm_index': osm_idx
-            })
+            }
+
+
+def compare_gps_lists(detected_objects, osm_ground_truth, verify_threshold=10.0, missing_threshold=15.0):
+    """
+    Compare detected objects with OSM ground truth.
+    
+    Args:
+        detected_objects: List of tuples [(lat, lon), ...] or an (N, 2) array
+        osm_ground_truth: List of tuples [(lat, lon), ...] or an (M, 2) array
+        verify_threshold: Distance in meters to consider a match as verified (default: 10)
+        missing_threshold: Distance in meters to search for missing signs (default: 15)
+    
+    Returns:
+        Dict with 'verified', 'new_signs', and 'missing_signs' lists
+    """
+    results = {
+        'verified': [],
+        'new_signs': [],
+        'missing_signs': []
+    }
+    
+    for status, record in compare_gps_iter(detected_objects, osm_ground_truth,
+                                           verify_threshold, missing_threshold):
+        results[status].append(record)
     
     return results
 
@@ -246,43 +704,60 @@ def print_results(results):
     print("=" * 80)
 
 
+CSV_HEADER = ['Status', 'Detected_Lat', 'Detected_Lon', 'OSM_Lat', 'OSM_Lon', 'Distance_m']
+
+
+def _format_result_row(status, item):
+    """Format one (status, record) comparison result as a CSV row tuple."""
+    if status == 'verified':
+        return (
+            'Verified',
+            f"{item['detected_point'][0]:.6f}",
+            f"{item['detected_point'][1]:.6f}",
+            f"{item['osm_point'][0]:.6f}",
+            f"{item['osm_point'][1]:.6f}",
+            f"{item['distance']:.2f}"
+        )
+    
+    if status == 'new_signs':
+        return (
+            'New Sign Detected',
+            f"{item['detected_point'][0]:.6f}",
+            f"{item['detected_point'][1]:.6f}",
+            f"{item['nearest_osm'][0]:.6f}" if item['nearest_osm'] else '',
+            f"{item['nearest_osm'][1]:.6f}" if item['nearest_osm'] else '',
+            f"{item['distance']:.2f}" if item['nearest_osm'] else 'N/A'
+        )
+    
+    det_lat = item['nearest_detected'][0] if item['nearest_detected'] else ''
+    det_lon = item['nearest_detected'][1] if item['nearest_detected'] else ''
+    return (
+        'Missing Sign on Road',
+        det_lat,
+        det_lon,
+        f"{item['osm_point'][0]:.6f}",
+        f"{item['osm_point'][1]:.6f}",
+        f"{item['distance']:.2f}" if item['nearest_detected'] else 'N/A'
+    )
+
+
+def _result_rows(results):
+    """Yield one CSV row tuple per comparison result."""
+    for status in ('verified', 'new_signs', 'missing_signs'):
+        for item in results[status]:
+            yield _format_result_row(status, item)
+
+
 def save_results_to_csv(results, output_file='comparison_results.csv'):
     """Save comparison results to CSV file."""
+    # Format every row into memory in one writerows call, then write once
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_HEADER)
+    writer.writerows(_result_rows(results))
+    
     with open(output_file, 'w', newline='') as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow(['Status', 'Detected_Lat', 'Detected_Lon', 'OSM_Lat', 'OSM_Lon', 'Distance_m'])
-        
-        for item in results['verified']:
-            writer.writerow([
-                'Verified',
-                f"{item['detected_point'][0]:.6f}",
-                f"{item['detected_point'][1]:.6f}",
-                f"{item['osm_point'][0]:.6f}",
-                f"{item['osm_point'][1]:.6f}",
-                f"{item['distance']:.2f}"
-            ])
-        
-        for item in results['new_signs']:
-            writer.writerow([
-                'New Sign Detected',
-                f"{item['detected_point'][0]:.6f}",
-                f"{item['detected_point'][1]:.6f}",
-                f"{item['nearest_osm'][0]:.6f}" if item['nearest_osm'] else '',
-                f"{item['nearest_osm'][1]:.6f}" if item['nearest_osm'] else '',
-                f"{item['distance']:.2f}" if item['nearest_osm'] else 'N/A'
-            ])
-        
-        for item in results['missing_signs']:
-            det_lat = item['nearest_detected'][0] if item['nearest_detected'] else ''
-            det_lon = item['nearest_detected'][1] if item['nearest_detected'] else ''
-            writer.writerow([
-                'Missing Sign on Road',
-                det_lat,
-                det_lon,
-                f"{item['osm_point'][0]:.6f}",
-                f"{item['osm_point'][1]:.6f}",
-                f"{item['distance']:.2f}" if item['nearest_detected'] else 'N/A'
-            ])
+        csvfile.write(buffer.getvalue())
     
     print(f"\nResults saved to: {output_file}")
 
@@ -304,28 +779,8 @@ if __name__ == "__main__":
         else:
             print(f"Looking for any nodes with tag: {tag_key}\n")
         
-        # Parse OSM XML file
-        if tag_value:
-            osm_nodes = parse_osm_xml(osm_file, tag_key, tag_value)
-        else:
-            # Modified to accept any value for the tag
-            osm_nodes = []
-            try:
-                tree = ET.parse(osm_file)
-                root = tree.getroot()
-                for node in root.findall('.//node'):
-                    for tag in node.findall('tag'):
-                        if tag.get('k') == tag_key:
-                            node_data = {
-                                'id': node.get('id'),
-                                'lat': float(node.get('lat')),
-                                'lon': float(node.get('lon')),
-                                'type': tag.get('v')
-                            }
-                            osm_nodes.append(node_data)
-                            break
-            except Exception as e:
-                print(f"Error parsing OSM file: {e}")
+        # Parse OSM XML file (tag_value None matches any value for the tag)
+        osm_nodes = parse_osm_xml(osm_file, tag_key, tag_value)
         
         print("=" * 80)
         print("OSM TRAFFIC SIGNS EXTRACTION")
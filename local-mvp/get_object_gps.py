@@ -6,6 +6,13 @@ Calculates the GPS coordinates of an object given vehicle position, heading, and
 
 import math
 
+import numpy as np
+
+
+def _sincos(x):
+    """Return (sin(x), cos(x)) so each angle's pair is evaluated once."""
+    return math.sin(x), math.cos(x)
+
 
 def get_object_gps(vehicle_lat, vehicle_lon, heading, distance):
     """
@@ -34,16 +41,19 @@ def get_object_gps(vehicle_lat, vehicle_lon, heading, distance):
     # Angular distance in radians
     angular_distance = distance / R
     
+    # Each sine/cosine is used twice below, so compute them once
+    sin_lat, cos_lat = _sincos(lat_rad)
+    sin_ad, cos_ad = _sincos(angular_distance)
+    sin_heading, cos_heading = _sincos(heading_rad)
+    
     # Calculate new latitude
-    new_lat_rad = math.asin(
-        math.sin(lat_rad) * math.cos(angular_distance) +
-        math.cos(lat_rad) * math.sin(angular_distance) * math.cos(heading_rad)
-    )
+    sin_new_lat = sin_lat * cos_ad + cos_lat * sin_ad * cos_heading
+    new_lat_rad = math.asin(sin_new_lat)
     
     # Calculate new longitude
     new_lon_rad = lon_rad + math.atan2(
-        math.sin(heading_rad) * math.sin(angular_distance) * math.cos(lat_rad),
-        math.cos(angular_distance) - math.sin(lat_rad) * math.sin(new_lat_rad)
+        sin_heading * sin_ad * cos_lat,
+        cos_ad - sin_lat * sin_new_lat
     )
     
     # Convert back to degrees
@@ -53,6 +63,40 @@ def get_object_gps(vehicle_lat, vehicle_lon, heading, distance):
     return (new_lat, new_lon)
 
 
+def get_object_gps_batch(vehicle_lats, vehicle_lons, headings, distances):
+    """
+    Vectorized get_object_gps over arrays of vehicle positions and distances.
+    
+    Args:
+        vehicle_lats: Array of vehicle latitudes in decimal degrees
+        vehicle_lons: Array of vehicle longitudes in decimal degrees
+        headings: Array of headings in degrees (0 = North, 90 = East)
+        distances: Array of distances to the objects in meters
+    
+    Returns:
+        Tuple (lats, lons) of arrays with the object coordinates in decimal degrees
+    """
+    # Earth's radius in meters
+    R = 6371000.0
+    
+    lat_rad = np.radians(np.asarray(vehicle_lats, dtype=np.float64))
+    lon_rad = np.radians(np.asarray(vehicle_lons, dtype=np.float64))
+    heading_rad = np.radians(np.asarray(headings, dtype=np.float64))
+    angular_distance = np.asarray(distances, dtype=np.float64) / R
+    
+    sin_lat, cos_lat = np.sin(lat_rad), np.cos(lat_rad)
+    sin_ad, cos_ad = np.sin(angular_distance), np.cos(angular_distance)
+    
+    sin_new_lat = sin_lat * cos_ad + cos_lat * sin_ad * np.cos(heading_rad)
+    new_lat_rad = np.arcsin(sin_new_lat)
+    new_lon_rad = lon_rad + np.arctan2(
+        np.sin(heading_rad) * sin_ad * cos_lat,
+        cos_ad - sin_lat * sin_new_lat
+    )
+    
+    return np.degrees(new_lat_rad), np.degrees(new_lon_rad)
+
+
 if __name__ == "__main__":
     # Test case: Vehicle at a known position
     vehicle_lat = 37.7749  # San Francisco latitude
@@ -6,21 +6,29 @@ Calculates distance to an object based on its vertical pixel position in the ima
 
 import math
 
+import numpy as np
+
 
 def pixel_to_distance(v_pixel, H=1440, h=1.4, v_fov=92, v_horizon=None):
     """
     Calculate distance to an object based on its vertical pixel position.
     
     Args:
-        v_pixel: Vertical pixel coordinate (y-coordinate, with origin at top)
+        v_pixel: Vertical pixel coordinate (y-coordinate, with origin at top),
+            or an array of them
         H: Image height in pixels (default: 1440)
         h: Camera height above ground in meters (default: 1.4)
         v_fov: Vertical field of view in degrees (default: 92)
         v_horizon: Vertical pixel position of the horizon (default: H/2 if not specified)
     
     Returns:
-        Distance to object in meters, or float('inf') if above horizon
+        Distance to object in meters, or float('inf') if above horizon.
+        Array input returns an array (see pixel_to_distance_vec).
     """
+    # Arrays go through the vectorized version in one pass
+    if not np.isscalar(v_pixel):
+        return pixel_to_distance_vec(v_pixel, H=H, h=h, v_fov=v_fov, v_horizon=v_horizon)
+    
     # Use H/2 as horizon if not specified
     if v_horizon is None:
         v_horizon = H / 2
@@ -41,6 +49,34 @@ def pixel_to_distance(v_pixel, H=1440, h=1.4, v_fov=92, v_horizon=None):
     return D
 
 
+def pixel_to_distance_vec(v_pixels, H=1440, h=1.4, v_fov=92, v_horizon=None):
+    """
+    Vectorized pixel_to_distance over an array of vertical pixel positions.
+    
+    Args:
+        v_pixels: Array of vertical pixel coordinates (origin at top)
+        H, h, v_fov, v_horizon: Same as pixel_to_distance
+    
+    Returns:
+        Array of distances in meters, inf where the object is above the horizon
+    """
+    if v_horizon is None:
+        v_horizon = H / 2
+    
+    # Pixels-to-tangent scale, computed once for the whole array
+    k = math.tan(math.radians(v_fov / 2)) / (H / 2)
+    
+    delta_v = np.asarray(v_pixels, dtype=np.float64) - v_horizon
+    distances = np.full(delta_v.shape, np.inf)
+    
+    # Only points below the horizon have a finite ground distance
+    below = delta_v > 0
+    alpha = np.arctan(delta_v[below] * k)
+    distances[below] = h / np.tan(alpha)
+    
+    return distances
+
+
 if __name__ == "__main__":
     # Test with v_pixel = 761 (sign bottom) and horizon at H/2 = 720
     v_pixel_test = 761
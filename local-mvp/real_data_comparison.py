@@ -9,30 +9,42 @@ This script requires:
 3. Vehicle GPS/heading data for each frame (to be provided)
 """
 
-import csv
 import sys
+
+import numpy as np
+import pandas as pd
+
 sys.path.insert(0, '/Users/boyangli/Repo/Mapping')
 
 from compare_gps import parse_osm_xml, osm_nodes_to_coordinates, compare_gps_lists, print_results, save_results_to_csv
-from pixel_to_distance import pixel_to_distance
-from get_object_gps import get_object_gps
+from pixel_to_distance import pixel_to_distance_vec
+from get_object_gps import get_object_gps_batch
+
+
+# Column dtypes for the detection CSV, parsed directly by pandas' C reader
+DETECTION_DTYPES = {
+    'frame_number': 'int32',
+    'timestamp_sec': 'float32',
+    'u': 'float64',
+    'v': 'float64',
+    'confidence': 'float32',
+    'class_name': 'string'
+}
 
 
 def load_detected_signs(csv_file):
-    """Load detected traffic signs from CSV file."""
-    detections = []
-    with open(csv_file, 'r') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            detections.append({
-                'frame': int(row['frame_number']),
-                'timestamp': float(row['timestamp_sec']),
-                'u': float(row['u']),
-                'v': float(row['v']),
-                'confidence': float(row['confidence']),
-                'class': row['class_name']
-            })
-    return detections
+    """
+    Load detected traffic signs from CSV file.
+    
+    Returns:
+        DataFrame with 'frame', 'timestamp', 'u', 'v', 'confidence' and 'class' columns
+    """
+    df = pd.read_csv(csv_file, usecols=list(DETECTION_DTYPES), dtype=DETECTION_DTYPES)
+    return df.rename(columns={
+        'frame_number': 'frame',
+        'timestamp_sec': 'timestamp',
+        'class_name': 'class'
+    })
 
 
 def convert_detections_to_gps(detections, vehicle_gps_data, H=1440, h=1.4, v_fov=92):
@@ -40,7 +52,7 @@ def convert_detections_to_gps(detections, vehicle_gps_data, H=1440, h=1.4, v_fov
     Convert pixel coordinates to GPS coordinates.
     
     Args:
-        detections: List of detection dictionaries with 'frame', 'u', 'v'
+        detections: DataFrame of detections with 'frame', 'u', 'v' columns
         vehicle_gps_data: Dict mapping frame_number to (lat, lon, heading)
         H: Image height in pixels
         h: Camera height in meters
@@ -49,36 +61,57 @@ def convert_detections_to_gps(detections, vehicle_gps_data, H=1440, h=1.4, v_fov
     Returns:
         List of (lat, lon) tuples for detected objects
     """
-    gps_coordinates = []
+    vehicle = _vehicle_gps_for(detections, vehicle_gps_data)
+    has_gps = ~np.isnan(vehicle[:, 0])
+    for frame in detections['frame'][~has_gps].tolist():
+        print(f"Warning: No GPS data for frame {frame}, skipping...")
+    
+    # Drop objects at or above the horizon (v <= H/2) before any distance math;
+    # pixel_to_distance would return inf for them anyway
+    v_pixels = detections['v'].to_numpy()
+    located = has_gps & (v_pixels > H / 2)
+    
+    distances = pixel_to_distance_vec(v_pixels[located], H=H, h=h, v_fov=v_fov)
+    return _locate_detections(detections, located, vehicle[located], distances)
+
+
+def _vehicle_gps_for(detections, vehicle_gps_data):
+    """
+    Look up the vehicle (lat, lon, heading) for every detection's frame.
     
-    for detection in detections:
-        frame = detection['frame']
-        v_pixel = detection['v']
-        
-        # Get vehicle GPS and heading for this frame
-        if frame not in vehicle_gps_data:
-            print(f"Warning: No GPS data for frame {frame}, skipping...")
-            continue
-        
-        vehicle_lat, vehicle_lon, heading = vehicle_gps_data[frame]
-        
-        # Convert pixel to distance
-        distance = pixel_to_distance(v_pixel, H=H, h=h, v_fov=v_fov)
-        
-        # Skip if object is above horizon (infinite distance)
-        if distance == float('inf'):
-            continue
-        
-        # Convert to GPS coordinates
-        object_lat, object_lon = get_object_gps(vehicle_lat, vehicle_lon, heading, distance)
-        gps_coordinates.append((object_lat, object_lon))
-        
-        # Optional: store the GPS in the detection dict for reference
-        detection['gps_lat'] = object_lat
-        detection['gps_lon'] = object_lon
-        detection['distance_m'] = distance
+    Returns:
+        (N, 3) float array aligned with detections, NaN where a frame has no GPS data
+    """
+    vehicle_df = pd.DataFrame.from_dict(vehicle_gps_data, orient='index',
+                                        columns=['lat', 'lon', 'heading'])
+    return vehicle_df.reindex(detections['frame'].to_numpy()).to_numpy(dtype=np.float64)
+
+
+def _locate_detections(detections, located, vehicle, distances):
+    """
+    Convert detections to GPS in one batched call to get_object_gps_batch.
+    
+    Args:
+        detections: DataFrame of detections; GPS columns are added in place
+        located: Boolean mask of the rows to locate
+        vehicle: (K, 3) array of vehicle (lat, lon, heading) for the located rows
+        distances: Distance in meters to each located detection
+    
+    Returns:
+        List of (lat, lon) tuples for the detected objects
+    """
+    if not located.any():
+        return []
+    
+    object_lats, object_lons = get_object_gps_batch(vehicle[:, 0], vehicle[:, 1],
+                                                    vehicle[:, 2], distances)
+    
+    # Optional: store the GPS alongside the detections for reference
+    detections.loc[located, 'gps_lat'] = object_lats
+    detections.loc[located, 'gps_lon'] = object_lons
+    detections.loc[located, 'distance_m'] = distances
     
-    return gps_coordinates
+    return list(zip(object_lats.tolist(), object_lons.tolist()))
 
 
 if __name__ == "__main__":
@@ -90,8 +123,8 @@ if __name__ == "__main__":
     print("\n1. Loading detected traffic signs from video...")
     detections = load_detected_signs('/Users/boyangli/Repo/Mapping/traffic_signs.csv')
     print(f"   Loaded {len(detections)} detections")
-    print(f"   Classes: {set(d['class'] for d in detections)}")
-    print(f"   Frames: {min(d['frame'] for d in detections)} to {max(d['frame'] for d in detections)}")
+    print(f"   Classes: {set(detections['class'].unique())}")
+    print(f"   Frames: {detections['frame'].min()} to {detections['frame'].max()}")
     
     # Step 2: Load OSM ground truth
     print("\n2. Loading OSM ground truth...")
@@ -120,8 +153,7 @@ if __name__ == "__main__":
     base_heading = 0  # North
     
     # Simulate vehicle moving slowly north
-    for detection in detections:
-        frame = detection['frame']
+    for frame in detections['frame'].unique().tolist():
         # Simulate slight movement (very rough approximation)
         lat_offset = frame * 0.00001  # Small incremental movement
         vehicle_gps_data[frame] = (base_lat + lat_offset, base_lon, base_heading)
@@ -135,12 +167,12 @@ if __name__ == "__main__":
     gps_coordinates = []  # Initialize here
     
     # Check v-pixel distribution
-    v_values = [d['v'] for d in detections]
-    below_horizon = sum(1 for v in v_values if v > 720)
-    above_horizon = sum(1 for v in v_values if v <= 720)
+    v_values = detections['v']
+    below_horizon = int((v_values > 720).sum())
+    above_horizon = int((v_values <= 720).sum())
     
     print(f"   V-pixel distribution:")
-    print(f"   - Min v: {min(v_values):.1f}, Max v: {max(v_values):.1f}")
+    print(f"   - Min v: {v_values.min():.1f}, Max v: {v_values.max():.1f}")
     print(f"   - Horizon at v=720 (H/2)")
     print(f"   - Below horizon (v > 720): {below_horizon} detections")
     print(f"   - Above horizon (v <= 720): {above_horizon} detections")
@@ -157,17 +189,10 @@ if __name__ == "__main__":
         
         # Use fixed distance for all detections
         fixed_distance = 30.0
-        for detection in detections:
-            frame = detection['frame']
-            if frame not in vehicle_gps_data:
-                continue
-            
-            vehicle_lat, vehicle_lon, heading = vehicle_gps_data[frame]
-            object_lat, object_lon = get_object_gps(vehicle_lat, vehicle_lon, heading, fixed_distance)
-            gps_coordinates.append((object_lat, object_lon))
-            detection['gps_lat'] = object_lat
-            detection['gps_lon'] = object_lon
-            detection['distance_m'] = fixed_distance
+        vehicle = _vehicle_gps_for(detections, vehicle_gps_data)
+        located = ~np.isnan(vehicle[:, 0])
+        gps_coordinates = _locate_detections(detections, located, vehicle[located],
+                                             np.full(int(located.sum()), fixed_distance))
         
         detected_gps = gps_coordinates
     else:
@@ -177,12 +202,12 @@ if __name__ == "__main__":
     
     # Show sample conversions
     print("\n   Sample conversions:")
-    for i in range(min(5, len(detections))):
-        det = detections[i]
-        if 'gps_lat' in det:
-            print(f"   Frame {det['frame']}: v={det['v']:.0f}px → "
-                  f"dist={det['distance_m']:.1f}m → "
-                  f"GPS=({det['gps_lat']:.6f}, {det['gps_lon']:.6f})")
+    sample = detections.head(5)
+    if 'gps_lat' in sample:
+        for det in sample.dropna(subset=['gps_lat']).itertuples():
+            print(f"   Frame {det.frame}: v={det.v:.0f}px → "
+                  f"dist={det.distance_m:.1f}m → "
+                  f"GPS=({det.gps_lat:.6f}, {det.gps_lon:.6f})")
     
     # Step 5: Compare with OSM ground truth
     print("\n5. Comparing detected signs with OSM ground truth...")
@@ -3,15 +3,62 @@
 Test script to compare detected traffic signs with OSM ground truth.
 """
 
+import os
 import sys
+import zipfile
+from pathlib import Path
+
+import numpy as np
+
 sys.path.insert(0, '/Users/boyangli/Repo/Mapping')
 
-from compare_gps import parse_osm_xml, osm_nodes_to_coordinates, compare_gps_lists, print_results, save_results_to_csv
+from compare_gps import parse_osm_xml, compare_gps_lists, print_results, save_results_to_csv
+
+
+def load_osm_coordinates(osm_file_path, tag_key, tag_value=None):
+    """
+    Load (lat, lon) tuples for tagged OSM nodes, caching the parse result.
+    
+    The coordinates are saved to a .npz next to the XML file and reused while
+    the XML's size and modification time are unchanged. Empty results (a
+    missing or unparseable file) are never cached.
+    """
+    osm_path = Path(osm_file_path)
+    cache_path = osm_path.with_suffix(f'.{tag_key}.npz')
+    try:
+        xml_stat = osm_path.stat()
+    except OSError:
+        # Let parse_osm_xml report the missing file and return no nodes
+        xml_stat = None
+    
+    if xml_stat is not None and cache_path.exists():
+        try:
+            with np.load(cache_path, allow_pickle=False) as cached:
+                if (cached['xml_size'] == xml_stat.st_size and cached['xml_mtime'] == xml_stat.st_mtime
+                        and str(cached['tag_value']) == str(tag_value)):
+                    return list(zip(cached['lat'].tolist(), cached['lon'].tolist()))
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            # Truncated or stale cache: fall through and rebuild it
+            pass
+    
+    columns = parse_osm_xml(osm_file_path, tag_key, tag_value, as_arrays=True)
+    if xml_stat is not None and len(columns['lat']) > 0:
+        # Write to a temp file and swap it in so a crash never leaves a partial cache
+        tmp_path = cache_path.with_name(f'{cache_path.name}.{os.getpid()}.tmp')
+        try:
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, lat=columns['lat'], lon=columns['lon'],
+                         xml_size=xml_stat.st_size, xml_mtime=xml_stat.st_mtime, tag_value=str(tag_value))
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            print(f"⚠️  Could not write OSM cache {cache_path}: {e}")
+            tmp_path.unlink(missing_ok=True)
+    return list(zip(columns['lat'].tolist(), columns['lon'].tolist()))
+
 
-# Parse OSM ground truth
+# Parse OSM ground truth (cached after the first run)
 print("Loading OSM ground truth data...")
-osm_nodes = parse_osm_xml('/Users/boyangli/Repo/Mapping/osm.xml', 'traffic_sign', None)
-osm_ground_truth = osm_nodes_to_coordinates(osm_nodes)
+osm_ground_truth = load_osm_coordinates('/Users/boyangli/Repo/Mapping/osm.xml', 'traffic_sign', None)
 
 print(f"Loaded {len(osm_ground_truth)} traffic signs from OSM:")
 for i, (lat, lon) in enumerate(osm_ground_truth, 1):
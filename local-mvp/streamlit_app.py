@@ -5,13 +5,14 @@ A Streamlit app to visualize detected traffic signs and OSM ground truth.
 """
 
 import streamlit as st
+import numpy as np
 import pandas as pd
-import folium
-from streamlit_folium import st_folium
+import pydeck as pdk
+import os
 import sys
 sys.path.insert(0, '/Users/boyangli/Repo/Mapping')
 
-from compare_gps import parse_osm_xml, osm_nodes_to_coordinates
+from compare_gps import parse_osm_xml
 
 # Page configuration
 st.set_page_config(
@@ -24,67 +25,202 @@ st.set_page_config(
 st.title("🚦 Traffic Sign Mapping & Validation Dashboard")
 st.markdown("---")
 
+DETECTIONS_CSV = '/Users/boyangli/Repo/Mapping/traffic_signs.csv'
+OSM_XML = '/Users/boyangli/Repo/Mapping/osm.xml'
+DETECTION_COLUMNS = ['frame_number', 'timestamp_sec', 'u', 'v', 'confidence', 'class_name']
+
+def materialize_parquet(csv_path):
+    """
+    Write a Parquet copy of a CSV next to it, refreshing it when the CSV is newer.
+    
+    Args:
+        csv_path: Path to the source CSV file
+    
+    Returns:
+        Path to the Parquet file, or None if it could not be written
+        (e.g. pyarrow is not installed)
+    """
+    parquet_path = os.path.splitext(csv_path)[0] + '.parquet'
+    if os.path.exists(parquet_path) and os.path.getmtime(parquet_path) >= os.path.getmtime(csv_path):
+        return parquet_path
+    try:
+        pd.read_csv(csv_path).to_parquet(parquet_path, index=False)
+    except (ImportError, OSError):
+        return None
+    return parquet_path
+
 # Load data
 @st.cache_data
-def load_detections():
-    """Load detected traffic signs from CSV."""
-    df = pd.read_csv('/Users/boyangli/Repo/Mapping/traffic_signs.csv')
+def load_detections(path, mtime):
+    """
+    Load detected traffic signs, from a Parquet copy of the CSV when available.
+    
+    Args:
+        path: Detections CSV path (cache key)
+        mtime: Modification time of the file (cache key), so a new version
+               of the file is re-read instead of served from the cache
+    """
+    parquet_path = materialize_parquet(path)
+    if parquet_path is not None:
+        df = pd.read_parquet(parquet_path, columns=DETECTION_COLUMNS)
+    else:
+        df = pd.read_csv(path, usecols=DETECTION_COLUMNS)
+    # A handful of class names: categorical codes make counts, filters and groupbys integer ops
+    df['class_name'] = df['class_name'].astype('category')
     return df
 
 @st.cache_data
-def load_osm_data():
-    """Load OSM ground truth data."""
-    osm_nodes = parse_osm_xml('/Users/boyangli/Repo/Mapping/osm.xml', 'traffic_sign', None)
+def load_osm_data(path, mtime):
+    """
+    Load OSM ground truth data as columns ('id', 'type', 'lat', 'lon' arrays).
+    
+    Args:
+        path: OSM file path (cache key)
+        mtime: Modification time of the file (cache key)
+    """
+    osm_nodes = parse_osm_xml(path, 'traffic_sign', None, as_arrays=True)
     return osm_nodes
 
+@st.cache_resource
+def build_osm_map(path, mtime):
+    """
+    Build the OSM sign map once per version of the OSM file. Cached as a
+    resource so reruns reuse the same Deck without re-serializing the layer.
+    
+    Args:
+        path: OSM file path (cache key)
+        mtime: Modification time of the file (cache key)
+    
+    Returns:
+        pydeck Deck with one scatterplot layer of OSM signs
+    """
+    osm_nodes = load_osm_data(path, mtime)
+    osm_df = pd.DataFrame(osm_nodes, columns=['id', 'type', 'lat', 'lon'])
+    
+    # Center map on OSM points
+    avg_lat, avg_lon = osm_nodes['lat'].mean(), osm_nodes['lon'].mean()
+    
+    # Single scatterplot layer for all OSM points
+    markers = osm_df.assign(
+        label="OSM Sign " + pd.Series(range(1, len(osm_df) + 1), index=osm_df.index).astype(str),
+        type=osm_df['type'].fillna('N/A')
+    )
+    layer = pdk.Layer(
+        "ScatterplotLayer",
+        data=markers,
+        get_position=["lon", "lat"],
+        get_fill_color=[255, 0, 0, 200],
+        get_radius=8,
+        radius_min_pixels=5,
+        pickable=True,
+    )
+    return pdk.Deck(
+        layers=[layer],
+        initial_view_state=pdk.ViewState(latitude=avg_lat, longitude=avg_lon, zoom=14),
+        tooltip={"html": "<b>{label}</b><br/>Type: {type}<br/>ID: {id}"}
+    )
+
 @st.cache_data
 def load_comparison_results():
     """Load comparison results if available."""
     try:
         df = pd.read_csv('/Users/boyangli/Repo/Mapping/real_comparison_results.csv')
+        df['Status'] = df['Status'].astype('category')
         return df
     except FileNotFoundError:
         return None
 
 def estimate_unique_signs(df):
-    """Rough estimate of unique signs by grouping nearby detections."""
-    unique_count = 0
-    processed = set()
+    """
+    Rough estimate of unique signs by grouping nearby detections.
     
-    for idx, row in df.iterrows():
-        if idx in processed:
-            continue
-        
-        # Find all detections of same class within 100 frames and similar position
-        similar = df[
-            (df['class_name'] == row['class_name']) &
-            (abs(df['frame_number'] - row['frame_number']) < 100) &
-            (abs(df['u'] - row['u']) < 200) &  # Similar horizontal position
-            (abs(df['v'] - row['v']) < 100)    # Similar vertical position
-        ]
-        
-        processed.update(similar.index)
-        unique_count += 1
+    Each detection is bucketed into a grid cell of the same class spanning
+    100 frames, 200px horizontally and 100px vertically, and the number of
+    occupied cells is returned. This is a single vectorized pass; unlike a
+    pairwise window, two detections just either side of a cell edge count
+    as separate signs.
+    """
+    if df.empty:
+        return 0
     
-    return unique_count
+    class_codes = pd.factorize(df['class_name'])[0].astype(np.int64)
+    arr = df[['frame_number', 'u', 'v']].to_numpy(np.int64)
+    key = ((class_codes << 48) |
+           ((arr[:, 0] // 100) << 32) |
+           ((arr[:, 1] // 200) << 16) |
+           (arr[:, 2] // 100))
+    return int(np.unique(key).size)
+
+@st.cache_data
+def derive_stats(path, mtime):
+    """
+    Compute the dashboard's summary statistics once per version of the
+    detections file, so widget interactions don't redo them on every rerun.
+    
+    Args:
+        path: Detections file path (cache key)
+        mtime: Modification time of the file (cache key)
+    
+    Returns:
+        Dictionary of derived statistics
+    """
+    df = load_detections(path, mtime)
+    
+    # Confidence histogram per class, binned in a single pass
+    bins = np.linspace(0, 1, 11)
+    bin_labels = [f"{bins[i]:.2f}-{bins[i+1]:.2f}" for i in range(len(bins)-1)]
+    # Same edges as np.histogram: half-open bins, last one closed at 1.0
+    codes = np.clip(np.searchsorted(bins, df['confidence'].to_numpy(), side='right') - 1, 0, len(bin_labels) - 1)
+    binned = pd.Series(pd.Categorical.from_codes(codes, bin_labels), index=df.index, name='Range')
+    confidence_hist = df.groupby(['class_name', binned], observed=False).size().unstack(fill_value=0).T
+    
+    # Detections over time, in 20 equal-width bins labelled once per bin
+    ts = df['timestamp_sec'].to_numpy()
+    edges = np.linspace(ts.min(), ts.max(), 21)
+    time_labels = [f"{edges[i]:.1f}-{edges[i+1]:.1f}" for i in range(len(edges)-1)]
+    bin_idx = np.clip(np.digitize(ts, edges) - 1, 0, len(time_labels) - 1)
+    time_counts = (df.groupby([bin_idx, 'class_name'], observed=False).size()
+                   .unstack(fill_value=0)
+                   .reindex(range(len(time_labels)), fill_value=0))
+    time_counts.index = time_labels
+    
+    return {
+        'unique_signs': estimate_unique_signs(df),
+        'class_counts': df['class_name'].value_counts(),
+        'frames_analyzed': df['frame_number'].nunique(),
+        'confidence_hist': confidence_hist,
+        'time_counts': time_counts,
+    }
+
+@st.cache_resource
+def load_time_index(path, mtime):
+    """
+    Detections sorted by timestamp plus the timestamp array, for slicing
+    time windows with searchsorted. Cached as a resource so reruns share it
+    without copying; treat the returned frame as read-only.
+    """
+    df_sorted = load_detections(path, mtime).sort_values('timestamp_sec', kind='stable').reset_index(drop=True)
+    return df_sorted, df_sorted['timestamp_sec'].to_numpy()
 
 # Load all data
-detections_df = load_detections()
-osm_nodes = load_osm_data()
+detections_mtime = os.path.getmtime(DETECTIONS_CSV)
+detections_df = load_detections(DETECTIONS_CSV, detections_mtime)
+osm_mtime = os.path.getmtime(OSM_XML)
+osm_nodes = load_osm_data(OSM_XML, osm_mtime)
 comparison_df = load_comparison_results()
-unique_signs = estimate_unique_signs(detections_df)
+stats = derive_stats(DETECTIONS_CSV, detections_mtime)
+unique_signs = stats['unique_signs']
 
 # Sidebar - Summary Statistics
 st.sidebar.header("📊 Project Summary")
 
 st.sidebar.metric("Estimated Unique Signs", unique_signs)
-st.sidebar.metric("Frames Analyzed", detections_df['frame_number'].nunique())
-st.sidebar.metric("OSM Ground Truth", len(osm_nodes))
+st.sidebar.metric("Frames Analyzed", stats['frames_analyzed'])
+st.sidebar.metric("OSM Ground Truth", len(osm_nodes['id']))
 
 # Detection breakdown by class
 st.sidebar.subheader("Detection Breakdown")
-class_counts = detections_df['class_name'].value_counts()
-for class_name, count in class_counts.items():
+for class_name, count in stats['class_counts'].items():
     st.sidebar.write(f"- {class_name}: {count} instances")
 
 # Audit status
@@ -111,7 +247,6 @@ with col1:
     st.header("📹 Processed Video")
     
     # Check if video file exists
-    import os
     video_paths = [
         '/Users/boyangli/Repo/Mapping/traffic_sign_detection/vid_input.mp4',
         '/Users/boyangli/Repo/Mapping/vid_input.mp4'
@@ -148,10 +283,10 @@ with col1:
     
     # Get detections within 0.5 second window
     time_window = 0.5
-    nearby_detections = detections_df[
-        (detections_df['timestamp_sec'] >= current_time - time_window) &
-        (detections_df['timestamp_sec'] <= current_time + time_window)
-    ]
+    sorted_detections, sorted_ts = load_time_index(DETECTIONS_CSV, detections_mtime)
+    lo = np.searchsorted(sorted_ts, current_time - time_window, side='left')
+    hi = np.searchsorted(sorted_ts, current_time + time_window, side='right')
+    nearby_detections = sorted_detections.iloc[lo:hi]
     
     # Display current state
     if len(nearby_detections) > 0:
@@ -160,6 +295,7 @@ with col1:
         
         # Group by class and show counts
         class_counts = nearby_detections['class_name'].value_counts()
+        class_counts = class_counts[class_counts > 0]  # categorical counts include absent classes
         for class_name, count in class_counts.items():
             avg_conf = nearby_detections[nearby_detections['class_name'] == class_name]['confidence'].mean()
             st.write(f"- **{class_name}**: {count} detection(s) (avg confidence: {avg_conf:.1%})")
@@ -173,36 +309,13 @@ with col1:
 with col2:
     st.header("🗺️ Traffic Sign Locations")
     
-    if osm_nodes:
-        # Create map centered on OSM points
-        osm_coords = osm_nodes_to_coordinates(osm_nodes)
-        avg_lat = sum(lat for lat, lon in osm_coords) / len(osm_coords)
-        avg_lon = sum(lon for lat, lon in osm_coords) / len(osm_coords)
-        
-        # Create folium map
-        m = folium.Map(
-            location=[avg_lat, avg_lon],
-            zoom_start=14,
-            tiles='OpenStreetMap'
-        )
-        
-        # Add OSM points as markers
-        for i, node in enumerate(osm_nodes, 1):
-            folium.Marker(
-                location=[node['lat'], node['lon']],
-                popup=f"OSM Sign {i}<br>Type: {node.get('type', 'N/A')}<br>ID: {node['id']}",
-                tooltip=f"OSM Sign {i}",
-                icon=folium.Icon(color='red', icon='info-sign')
-            ).add_to(m)
-        
+    if len(osm_nodes['id']) > 0:
         # Display map
-        st_folium(m, width=700, height=500)
+        st.pydeck_chart(build_osm_map(OSM_XML, osm_mtime))
         
         # Display table
         st.subheader("OSM Traffic Signs")
-        osm_df = pd.DataFrame(osm_nodes)
-        osm_df = osm_df[['id', 'type', 'lat', 'lon']]
-        st.dataframe(osm_df, use_container_width=True)
+        st.dataframe(pd.DataFrame(osm_nodes, columns=['id', 'type', 'lat', 'lon']), use_container_width=True)
     else:
         st.warning("No OSM data found.")
 
@@ -221,7 +334,7 @@ with col2:
     st.caption("Across all video frames")
 
 with col3:
-    st.metric("Frames with Detections", detections_df['frame_number'].nunique())
+    st.metric("Frames with Detections", stats['frames_analyzed'])
     st.caption(f"Out of {detections_df['frame_number'].max()} total frames")
 
 st.markdown("---")
@@ -243,25 +356,13 @@ with col3:
 
 # Confidence distribution chart
 st.subheader("Confidence Distribution by Class")
-import numpy as np
-for class_name in detections_df['class_name'].unique():
-    class_df = detections_df[detections_df['class_name'] == class_name]
-    st.write(f"**{class_name}** (n={len(class_df)})")
-    
-    # Create histogram data with proper bin labels
-    bins = np.linspace(0, 1, 11)
-    hist_data, bin_edges = np.histogram(class_df['confidence'], bins=bins)
-    bin_labels = [f"{bin_edges[i]:.2f}-{bin_edges[i+1]:.2f}" for i in range(len(bin_edges)-1)]
-    hist_df = pd.DataFrame({'Range': bin_labels, 'Count': hist_data}).set_index('Range')
-    st.bar_chart(hist_df)
+confidence_hist = stats['confidence_hist']
+st.caption(" | ".join(f"**{class_name}** (n={n})" for class_name, n in confidence_hist.sum().items()))
+st.bar_chart(confidence_hist)
 
 # Detections over time
 st.subheader("Detections Over Time")
-detections_df['time_bin'] = pd.cut(detections_df['timestamp_sec'], bins=20)
-time_counts = detections_df.groupby(['time_bin', 'class_name']).size().unstack(fill_value=0)
-# Convert interval index to string for display
-time_counts.index = time_counts.index.astype(str)
-st.line_chart(time_counts)
+st.line_chart(stats['time_counts'])
 
 # Detection Data Table
 st.markdown("---")
@@ -272,8 +373,8 @@ col1, col2 = st.columns(2)
 with col1:
     selected_class = st.multiselect(
         "Filter by Class",
-        options=detections_df['class_name'].unique(),
-        default=detections_df['class_name'].unique()
+        options=list(detections_df['class_name'].cat.categories),
+        default=list(detections_df['class_name'].cat.categories)
     )
 with col2:
     min_confidence = st.slider(
@@ -23,86 +23,153 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+def fetch_dataframe(conn, query):
+    """Run a query and fetch the result as a DataFrame from Arrow batches."""
+    cur = conn.cursor()
+    try:
+        cur.execute(query)
+        return cur.fetch_pandas_all()
+    finally:
+        cur.close()
+
 @st.cache_data(ttl=30)
-def load_summary_metrics():
-    """Load aggregated metrics from fct_map_audit."""
+def load_dashboard_aggregates():
+    """Load summary metrics, daily verification trend and class breakdown in one query.
+    
+    Returns:
+        Tuple of (metrics dict, trend DataFrame, class breakdown DataFrame)
+    """
     conn = get_snowflake_connection()
     query = """
-    SELECT 
-        COUNT(*) as total_detections,
-        SUM(CASE WHEN AUDIT_STATUS = 'VERIFIED' THEN 1 ELSE 0 END) as verified_count,
-        SUM(CASE WHEN AUDIT_STATUS = 'NEW_DISCOVERY' THEN 1 ELSE 0 END) as new_discovery_count,
-        SUM(CASE WHEN AUDIT_STATUS = 'CLASS_MISMATCH' THEN 1 ELSE 0 END) as class_mismatch_count,
-        (verified_count * 100.0 / NULLIF(total_detections, 0)) as avg_verification_rate
-    FROM FCT_MAP_AUDIT
+    WITH base AS (
+        SELECT 
+            DETECTED_CLASS,
+            AUDIT_STATUS,
+            TRY_TO_DATE(RECORDING_TIMESTAMP, 'DD/MM/YYYY HH24:MI:SS') as DETECTION_DATE
+        FROM FCT_MAP_AUDIT
+    ),
+    summary AS (
+        SELECT 
+            COUNT(*) as total_detections,
+            SUM(CASE WHEN AUDIT_STATUS = 'VERIFIED' THEN 1 ELSE 0 END) as verified_count,
+            SUM(CASE WHEN AUDIT_STATUS = 'NEW_DISCOVERY' THEN 1 ELSE 0 END) as new_discovery_count,
+            SUM(CASE WHEN AUDIT_STATUS = 'CLASS_MISMATCH' THEN 1 ELSE 0 END) as class_mismatch_count,
+            (verified_count * 100.0 / NULLIF(total_detections, 0)) as avg_verification_rate
+        FROM base
+    ),
+    trend AS (
+        SELECT 
+            DETECTION_DATE,
+            COUNT(*) as TOTAL_DETECTIONS,
+            (SUM(CASE WHEN AUDIT_STATUS = 'VERIFIED' THEN 1 ELSE 0 END) * 100.0 / COUNT(*)) as VERIFICATION_RATE
+        FROM base
+        WHERE DETECTION_DATE IS NOT NULL
+        GROUP BY DETECTION_DATE
+        ORDER BY DETECTION_DATE DESC
+        LIMIT 30
+    ),
+    classes AS (
+        SELECT 
+            DETECTED_CLASS as CLASS_NAME,
+            AUDIT_STATUS as VERIFICATION_STATUS,
+            COUNT(*) as count
+        FROM base
+        GROUP BY DETECTED_CLASS, AUDIT_STATUS
+    )
+    SELECT 'summary' as KIND, total_detections, verified_count, new_discovery_count,
+           class_mismatch_count, avg_verification_rate,
+           NULL::DATE as DETECTION_DATE, NULL::FLOAT as VERIFICATION_RATE,
+           NULL::VARCHAR as CLASS_NAME, NULL::VARCHAR as VERIFICATION_STATUS, NULL::NUMBER as count
+    FROM summary
+    UNION ALL
+    SELECT 'trend', TOTAL_DETECTIONS, NULL, NULL, NULL, NULL,
+           DETECTION_DATE, VERIFICATION_RATE, NULL, NULL, NULL
+    FROM trend
+    UNION ALL
+    SELECT 'class', NULL, NULL, NULL, NULL, NULL,
+           NULL, NULL, CLASS_NAME, VERIFICATION_STATUS, count
+    FROM classes
     """
-    df = pd.read_sql(query, conn)
-    conn.close()
-    return df.iloc[0].to_dict()
+    df = fetch_dataframe(conn, query)
+    kind = df['KIND']
+    
+    metrics = df.loc[kind == 'summary', ['TOTAL_DETECTIONS', 'VERIFIED_COUNT', 'NEW_DISCOVERY_COUNT',
+                                         'CLASS_MISMATCH_COUNT', 'AVG_VERIFICATION_RATE']].iloc[0].to_dict()
+    trend_df = (df.loc[kind == 'trend', ['DETECTION_DATE', 'TOTAL_DETECTIONS', 'VERIFICATION_RATE']]
+                .sort_values('DETECTION_DATE', ascending=False)
+                .reset_index(drop=True))
+    class_df = df.loc[kind == 'class', ['CLASS_NAME', 'VERIFICATION_STATUS', 'COUNT']].reset_index(drop=True)
+    class_df['COUNT'] = class_df['COUNT'].astype('int64')
+    return metrics, trend_df, class_df
 
-@st.cache_data(ttl=30)
-def load_detection_points(limit=50000):
-    """Load detection points from fct_map_audit for heatmap."""
-    conn = get_snowflake_connection()
-    query = f"""
-    SELECT 
-        DETECTED_LAT as lat,
-        DETECTED_LON as lon,
-        DETECTED_CLASS as CLASS_NAME,
-        AUDIT_STATUS as VERIFICATION_STATUS,
-        CONFIDENCE
-    FROM FCT_MAP_AUDIT
-    WHERE DETECTED_LAT IS NOT NULL 
+# Bounding box shared by the map queries (Toronto / York Region). The H3_CELL_R6
+# predicate matches the table's clustering key so Snowflake can prune micro-partitions;
+# H3_COVERAGE returns every cell touching the box, so the exact bounds still apply.
+MAP_BOUNDS_FILTER = """
+      DETECTED_LAT IS NOT NULL 
       AND DETECTED_LON IS NOT NULL
+      AND H3_CELL_R6 IN (
+          SELECT VALUE::INT FROM TABLE(FLATTEN(H3_COVERAGE(
+              TO_GEOGRAPHY('POLYGON((-79.6 43.5, -79.0 43.5, -79.0 44.0, -79.6 44.0, -79.6 43.5))'), 6)))
+      )
       AND DETECTED_LAT BETWEEN 43.5 AND 44.0
       AND DETECTED_LON BETWEEN -79.6 AND -79.0
-    LIMIT {limit}
-    """
-    df = pd.read_sql(query, conn)
-    conn.close()
-    return df
+"""
+
+# Upper bound on raw points sent to the browser for the scatter plot; the heatmap
+# is aggregated to H3 cells in Snowflake and doesn't need raw points.
+SCATTER_MAX_POINTS = 10000
 
 @st.cache_data(ttl=30)
-def load_verification_trend():
-    """Load daily verification rate trend."""
+def load_detection_points(limit=SCATTER_MAX_POINTS):
+    """Load a random sample of detection points from fct_map_audit for the scatter plot."""
     conn = get_snowflake_connection()
-    query = """
-    SELECT 
-        TRY_TO_DATE(RECORDING_TIMESTAMP, 'DD/MM/YYYY HH24:MI:SS') as DETECTION_DATE,
-        COUNT(*) as TOTAL_DETECTIONS,
-        (SUM(CASE WHEN AUDIT_STATUS = 'VERIFIED' THEN 1 ELSE 0 END) * 100.0 / COUNT(*)) as VERIFICATION_RATE
-    FROM FCT_MAP_AUDIT
-    WHERE TRY_TO_DATE(RECORDING_TIMESTAMP, 'DD/MM/YYYY HH24:MI:SS') IS NOT NULL
-    GROUP BY DETECTION_DATE
-    ORDER BY DETECTION_DATE DESC
-    LIMIT 30
+    # Sample from the filtered rows so the limit is representative, not arbitrary
+    query = f"""
+    SELECT * FROM (
+        SELECT 
+            DETECTED_LAT as lat,
+            DETECTED_LON as lon,
+            DETECTED_CLASS as CLASS_NAME,
+            AUDIT_STATUS as VERIFICATION_STATUS,
+            CONFIDENCE
+        FROM FCT_MAP_AUDIT
+        WHERE {MAP_BOUNDS_FILTER}
+    ) SAMPLE ({min(int(limit), SCATTER_MAX_POINTS)} ROWS)
     """
-    df = pd.read_sql(query, conn)
-    conn.close()
+    df = fetch_dataframe(conn, query)
+    # Lowercase column names for pydeck in place, without copying the data
+    df.columns = df.columns.str.lower()
     return df
 
 @st.cache_data(ttl=30)
-def load_class_breakdown():
-    """Load detection breakdown by class and status."""
+def load_heatmap_cells(resolution=9):
+    """Load detections pre-aggregated into H3 cells for the heatmap."""
     conn = get_snowflake_connection()
-    query = """
+    query = f"""
+    WITH cells AS (
+        SELECT 
+            H3_LATLNG_TO_CELL(DETECTED_LAT, DETECTED_LON, {int(resolution)}) as CELL,
+            AVG(CONFIDENCE) as CONFIDENCE,
+            COUNT(*) as DETECTION_COUNT
+        FROM FCT_MAP_AUDIT
+        WHERE {MAP_BOUNDS_FILTER}
+        GROUP BY CELL
+    )
     SELECT 
-        DETECTED_CLASS as CLASS_NAME,
-        AUDIT_STATUS as VERIFICATION_STATUS,
-        COUNT(*) as count
-    FROM FCT_MAP_AUDIT
-    GROUP BY DETECTED_CLASS, AUDIT_STATUS
+        ST_Y(H3_CELL_TO_POINT(CELL)) as lat,
+        ST_X(H3_CELL_TO_POINT(CELL)) as lon,
+        CONFIDENCE,
+        DETECTION_COUNT
+    FROM cells
     """
-    df = pd.read_sql(query, conn)
-    conn.close()
+    df = fetch_dataframe(conn, query)
+    # Lowercase column names for pydeck in place, without copying the data
+    df.columns = df.columns.str.lower()
     return df
 
 def create_heatmap(df, config):
-    """Create pydeck heatmap visualization."""
-    # Ensure lowercase column names for pydeck
-    df = df.copy()
-    df.columns = df.columns.str.lower()
-    
+    """Create pydeck heatmap visualization from H3-aggregated cells."""
     layer = pdk.Layer(
         "HeatmapLayer",
         data=df,
@@ -123,15 +190,11 @@ def create_heatmap(df, config):
     return pdk.Deck(
         layers=[layer],
         initial_view_state=view_state,
-        tooltip={"text": "{class_name}\nStatus: {verification_status}"}
+        tooltip={"text": "{detection_count} detections\nAvg confidence: {confidence}"}
     )
 
 def create_scatterplot(df, config):
     """Create pydeck scatterplot colored by verification status."""
-    # Ensure lowercase column names for pydeck
-    df = df.copy()
-    df.columns = df.columns.str.lower()
-    
     # Color mapping
     color_map = {
         'VERIFIED': [0, 255, 0, 160],      # Green
@@ -139,13 +202,16 @@ def create_scatterplot(df, config):
         'CLASS_MISMATCH': [255, 0, 0, 160]    # Red
     }
     
-    df['color'] = df['verification_status'].map(color_map)
+    # Pick the color client-side with a deck.gl expression instead of adding a column
+    get_color = " : ".join(
+        f"verification_status == '{status}' ? {color}" for status, color in color_map.items()
+    ) + " : [128, 128, 128, 160]"
     
     layer = pdk.Layer(
         "ScatterplotLayer",
         data=df,
         get_position=["lon", "lat"],
-        get_color="color",
+        get_color=get_color,
         get_radius=15,
         pickable=True,
         opacity=0.6,
@@ -176,7 +242,7 @@ def main():
     # Sidebar
     st.sidebar.header("⚙️ Settings")
     map_type = st.sidebar.selectbox("Map Type", ["Heatmap", "Scatter Plot", "Both"])
-    max_points = st.sidebar.slider("Max Points", 1000, 100000, 50000, 1000)
+    max_points = st.sidebar.slider("Max Points", 1000, SCATTER_MAX_POINTS, SCATTER_MAX_POINTS, 1000)
     auto_refresh = st.sidebar.checkbox("Auto Refresh (30s)", value=False)
     
     if auto_refresh:
@@ -185,12 +251,13 @@ def main():
     # Load config
     config = get_config()
     
-    # Load data
+    # Load data (only the map layers that will be shown)
     with st.spinner("Loading data from Snowflake..."):
-        metrics = load_summary_metrics()
-        detection_df = load_detection_points(limit=max_points)
-        trend_df = load_verification_trend()
-        class_df = load_class_breakdown()
+        if map_type in ("Heatmap", "Both"):
+            heatmap_df = load_heatmap_cells()
+        if map_type in ("Scatter Plot", "Both"):
+            detection_df = load_detection_points(limit=max_points)
+        metrics, trend_df, class_df = load_dashboard_aggregates()
     
     # Metrics Row
     col1, col2, col3, col4 = st.columns(4)
@@ -224,17 +291,21 @@ def main():
     
     # Map Section
     st.subheader("📍 Detection Map")
-    st.caption(f"Showing {len(detection_df):,} detections")
+    if map_type == "Heatmap":
+        st.caption(f"Showing {int(heatmap_df['detection_count'].sum()):,} detections "
+                   f"in {len(heatmap_df):,} H3 cells")
+    else:
+        st.caption(f"Showing {len(detection_df):,} sampled detections")
     
     if map_type == "Heatmap":
-        st.pydeck_chart(create_heatmap(detection_df, config))
+        st.pydeck_chart(create_heatmap(heatmap_df, config))
     elif map_type == "Scatter Plot":
         st.pydeck_chart(create_scatterplot(detection_df, config))
     else:
         col_left, col_right = st.columns(2)
         with col_left:
             st.markdown("**Heatmap**")
-            st.pydeck_chart(create_heatmap(detection_df, config))
+            st.pydeck_chart(create_heatmap(heatmap_df, config))
         with col_right:
             st.markdown("**Scatter Plot (by Status)**")
             st.pydeck_chart(create_scatterplot(detection_df, config))
@@ -1,11 +1,13 @@
 import os
+import streamlit as st
 import snowflake.connector
 from dotenv import load_dotenv
 
 load_dotenv()
 
-def get_snowflake_connection():
-    """Create Snowflake connection using environment variables."""
+@st.cache_resource
+def _connect_snowflake():
+    """Open the Snowflake connection shared by all dashboard sessions."""
     return snowflake.connector.connect(
         account=os.getenv('SNOWFLAKE_ACCOUNT'),
         user=os.getenv('SNOWFLAKE_USER'),
@@ -13,9 +15,18 @@ def get_snowflake_connection():
         warehouse=os.getenv('SNOWFLAKE_WAREHOUSE'),
         database=os.getenv('SNOWFLAKE_DATABASE'),
         schema=os.getenv('SNOWFLAKE_SCHEMA'),
-        role=os.getenv('SNOWFLAKE_ROLE')
+        role=os.getenv('SNOWFLAKE_ROLE'),
+        client_session_keep_alive=True
     )
 
+def get_snowflake_connection():
+    """Get the shared Snowflake connection, reconnecting if it has been closed."""
+    conn = _connect_snowflake()
+    if conn.is_closed():
+        _connect_snowflake.clear()
+        conn = _connect_snowflake()
+    return conn
+
 def get_config():
     """Get dashboard configuration from environment variables."""
     return {
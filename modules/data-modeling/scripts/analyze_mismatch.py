@@ -19,6 +19,14 @@ conn = snowflake.connector.connect(
 
 cur = conn.cursor()
 
+def iter_rows(cursor, batch_size=1000):
+    """Yield result rows, fetching them from the server in batches."""
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield from rows
+
 print("="*80)
 print("DETECTION vs OSM MISMATCH ANALYSIS")
 print("="*80)
@@ -28,13 +36,13 @@ print("\n1. DETECTION CLASSES (from Kafka)")
 print("-"*80)
 cur.execute("""
 SELECT 
-    DETECTION_DATA:class_name::STRING AS class_name,
+    class_name,
     COUNT(*) as count
-FROM STG_DETECTIONS
+FROM STG_DETECTIONS_V
 GROUP BY class_name
 ORDER BY count DESC
 """)
-for row in cur:
+for row in iter_rows(cur):
     print(f"  {row[0]}: {row[1]} detections")
 
 # 2. Check OSM node types
@@ -49,7 +57,7 @@ GROUP BY OSM_TYPE
 ORDER BY count DESC
 LIMIT 20
 """)
-for row in cur:
+for row in iter_rows(cur):
     print(f"  {row[0]}: {row[1]} nodes")
 
 # 3. Sample detection coordinates
@@ -57,13 +65,13 @@ print("\n3. SAMPLE DETECTION COORDINATES")
 print("-"*80)
 cur.execute("""
 SELECT 
-    DETECTION_DATA:class_name::STRING AS class_name,
-    DETECTION_DATA:vehicle_lat::FLOAT AS lat,
-    DETECTION_DATA:vehicle_lon::FLOAT AS lon
-FROM STG_DETECTIONS
+    class_name,
+    lat,
+    lon
+FROM STG_DETECTIONS_V
 LIMIT 10
 """)
-for row in cur:
+for row in iter_rows(cur):
     print(f"  {row[0]}: ({row[1]:.6f}, {row[2]:.6f})")
 
 # 4. OSM coordinates for traffic_signals
@@ -78,30 +86,69 @@ FROM REF_OSM_NODES
 WHERE OSM_TYPE = 'traffic_signals'
 LIMIT 5
 """)
-for row in cur:
+for row in iter_rows(cur):
     print(f"  {row[0]}: ({row[1]:.6f}, {row[2]:.6f})")
 
+# Candidate detection/OSM pairs for the proximity queries below. Both sides are
+# bucketed into H3 cells and each detection is equi-joined against the OSM nodes in
+# its cell and the ring around it, so ST_DISTANCE only runs on nearby pairs instead
+# of the full STG_DETECTIONS x REF_OSM_NODES cross join. A ring-1 disk reliably
+# covers about one cell edge: ~170 m at resolution 9, ~1.2 km at resolution 7.
+def h3_candidates_cte(resolution):
+    return f"""
+WITH det AS (
+    SELECT 
+        detection_id,
+        class_name AS detection_class,
+        lat AS det_lat,
+        lon AS det_lon
+    FROM STG_DETECTIONS_V
+    WHERE lat IS NOT NULL
+      AND lon IS NOT NULL
+),
+det_cells AS (
+    SELECT det.*, ring.VALUE::INT AS cell
+    FROM det,
+         LATERAL FLATTEN(input => H3_GRID_DISK(H3_LATLNG_TO_CELL(det.det_lat, det.det_lon, {resolution}), 1)) ring
+),
+osm AS (
+    SELECT 
+        OSM_TYPE,
+        LATITUDE AS osm_lat,
+        LONGITUDE AS osm_lon,
+        LOCATION AS osm_location,
+        H3_LATLNG_TO_CELL(LATITUDE, LONGITUDE, {resolution}) AS cell
+    FROM REF_OSM_NODES
+),
+candidates AS (
+    SELECT 
+        det_cells.detection_id,
+        det_cells.detection_class,
+        det_cells.det_lat,
+        det_cells.det_lon,
+        osm.OSM_TYPE,
+        osm.osm_lat,
+        osm.osm_lon,
+        ST_DISTANCE(ST_MAKEPOINT(det_cells.det_lon, det_cells.det_lat), osm.osm_location) AS distance_meters
+    FROM det_cells
+    JOIN osm ON osm.cell = det_cells.cell
+)
+"""
+
 # 5. Check proximity - any matches within 100m?
 print("\n5. PROXIMITY CHECK (within 100 meters)")
 print("-"*80)
-cur.execute("""
+cur.execute(h3_candidates_cte(9) + """
 SELECT 
-    d.DETECTION_DATA:class_name::STRING AS detection_class,
-    d.DETECTION_DATA:vehicle_lat::FLOAT AS det_lat,
-    d.DETECTION_DATA:vehicle_lon::FLOAT AS det_lon,
-    osm.OSM_TYPE,
-    osm.LATITUDE AS osm_lat,
-    osm.LONGITUDE AS osm_lon,
-    ST_DISTANCE(
-        TO_GEOGRAPHY('POINT(' || d.DETECTION_DATA:vehicle_lon::FLOAT || ' ' || d.DETECTION_DATA:vehicle_lat::FLOAT || ')'),
-        TO_GEOGRAPHY('POINT(' || osm.LONGITUDE || ' ' || osm.LATITUDE || ')')
-    ) AS distance_meters
-FROM STG_DETECTIONS d
-CROSS JOIN REF_OSM_NODES osm
-WHERE ST_DISTANCE(
-    TO_GEOGRAPHY('POINT(' || d.DETECTION_DATA:vehicle_lon::FLOAT || ' ' || d.DETECTION_DATA:vehicle_lat::FLOAT || ')'),
-    TO_GEOGRAPHY('POINT(' || osm.LONGITUDE || ' ' || osm.LATITUDE || ')')
-) < 100
+    detection_class,
+    det_lat,
+    det_lon,
+    OSM_TYPE,
+    osm_lat,
+    osm_lon,
+    distance_meters
+FROM candidates
+WHERE distance_meters < 100
 ORDER BY distance_meters
 LIMIT 10
 """)
@@ -113,30 +160,10 @@ if matches:
 else:
     print("  ❌ NO MATCHES FOUND")
 
-# 6. Find nearest OSM node to each detection
-print("\n6. NEAREST OSM NODE TO EACH DETECTION (top 5)")
+# 6. Find nearest OSM node to each detection (searched within ~1 km)
+print("\n6. NEAREST OSM NODE TO EACH DETECTION (top 5, within ~1 km)")
 print("-"*80)
-cur.execute("""
-WITH nearest_osm AS (
-    SELECT 
-        d.DETECTION_DATA:detection_id::STRING AS detection_id,
-        d.DETECTION_DATA:class_name::STRING AS detection_class,
-        d.DETECTION_DATA:vehicle_lat::FLOAT AS det_lat,
-        d.DETECTION_DATA:vehicle_lon::FLOAT AS det_lon,
-        osm.OSM_TYPE,
-        osm.LATITUDE AS osm_lat,
-        osm.LONGITUDE AS osm_lon,
-        ST_DISTANCE(
-            TO_GEOGRAPHY('POINT(' || d.DETECTION_DATA:vehicle_lon::FLOAT || ' ' || d.DETECTION_DATA:vehicle_lat::FLOAT || ')'),
-            TO_GEOGRAPHY('POINT(' || osm.LONGITUDE || ' ' || osm.LATITUDE || ')')
-        ) AS distance_meters,
-        ROW_NUMBER() OVER (PARTITION BY d.DETECTION_DATA:detection_id::STRING ORDER BY ST_DISTANCE(
-            TO_GEOGRAPHY('POINT(' || d.DETECTION_DATA:vehicle_lon::FLOAT || ' ' || d.DETECTION_DATA:vehicle_lat::FLOAT || ')'),
-            TO_GEOGRAPHY('POINT(' || osm.LONGITUDE || ' ' || osm.LATITUDE || ')')
-        )) AS rn
-    FROM STG_DETECTIONS d
-    CROSS JOIN REF_OSM_NODES osm
-)
+cur.execute(h3_candidates_cte(7) + """
 SELECT 
     detection_class,
     det_lat,
@@ -145,12 +172,12 @@ SELECT
     osm_lat,
     osm_lon,
     distance_meters
-FROM nearest_osm
-WHERE rn = 1
+FROM candidates
+QUALIFY ROW_NUMBER() OVER (PARTITION BY detection_id ORDER BY distance_meters) = 1
 ORDER BY distance_meters
 LIMIT 5
 """)
-for row in cur:
+for row in iter_rows(cur):
     print(f"  {row[0]} ({row[1]:.6f}, {row[2]:.6f}) → nearest: {row[3]} ({row[4]:.6f}, {row[5]:.6f}) = {row[6]:.1f}m")
 
 print("\n" + "="*80)
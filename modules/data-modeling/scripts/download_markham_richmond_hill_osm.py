@@ -6,6 +6,10 @@ Based on actual detection locations from batch_detections.csv
 
 import requests
 import os
+import queue
+import threading
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # Bounding box covering Markham and Richmond Hill detection areas
 # Based on your data: lat 43.79-43.85, lon -79.32 to -79.31
@@ -16,11 +20,13 @@ BBOX = {
     'east': -79.30
 }
 
-OUTPUT_FILE = "../../data/markham_richmond_hill_traffic.xml"
+OUTPUT_FILE = "../../data/markham_richmond_hill_traffic.json"
+CHUNK_SIZE = 1024 * 1024  # 1 MB download buffer
+HEDGE_DELAY = 30  # Seconds to wait on a mirror before also asking the next one
 
-# Overpass API query
+# Overpass API query (JSON output: more compact than XML and cheaper to parse)
 OVERPASS_QUERY = f"""
-[out:xml][timeout:180];
+[out:json][timeout:180];
 (
   node["highway"="traffic_signals"]({BBOX['south']},{BBOX['west']},{BBOX['north']},{BBOX['east']});
   node["highway"="stop"]({BBOX['south']},{BBOX['west']},{BBOX['north']},{BBOX['east']});
@@ -32,9 +38,69 @@ out body;
 out skel qt;
 """
 
+def make_session():
+    """Create a pooled HTTP session that retries transient Overpass failures with backoff"""
+    retry = Retry(
+        total=3,
+        backoff_factor=1,
+        status_forcelist=[502, 503, 504],  # On 429 move on rather than re-asking a busy mirror
+        allowed_methods=frozenset(['POST'])  # Overpass queries are read-only, safe to retry
+    )
+    session = requests.Session()
+    adapter = HTTPAdapter(max_retries=retry)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+def fetch_to_file(session, url, dest, stop_event, open_responses):
+    """
+    Stream one mirror's response to dest
+    
+    Args:
+        session: requests.Session to use
+        url: Overpass API interpreter URL
+        dest: Path of the partial file to write
+        stop_event: threading.Event set once another mirror has won
+        open_responses: Set of in-flight responses, so the winner can close them
+    
+    Returns:
+        dest on success, None if cancelled because another mirror finished first
+    """
+    try:
+        # Stream the (gzip-compressed) response to disk chunk by chunk;
+        # iter_content decompresses on the fly
+        with session.post(url, data={'data': OVERPASS_QUERY}, headers={'Accept-Encoding': 'gzip'},
+                          stream=True, timeout=240) as response:
+            open_responses.add(response)
+            response.raise_for_status()
+            with open(dest, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    if stop_event.is_set():
+                        break
+                    f.write(chunk)
+                else:
+                    return dest
+    except BaseException:
+        if os.path.exists(dest):
+            os.remove(dest)
+        if stop_event.is_set():
+            return None  # Closed under us by the winning mirror
+        raise
+    os.remove(dest)
+    return None
+
+def _mirror_worker(session, url, dest, stop_event, open_responses, results):
+    """Run fetch_to_file and report (url, part_file, error) on the results queue"""
+    try:
+        results.put((url, fetch_to_file(session, url, dest, stop_event, open_responses), None))
+    except Exception as e:
+        results.put((url, None, e))
+
 def download_osm_data():
     """Download OSM data from Overpass API"""
-    # Try different Overpass API mirrors
+    # Mirrors in order of preference. The next one is only asked when the
+    # current one fails or is still silent after HEDGE_DELAY seconds, so a
+    # healthy primary is the only server queried.
     urls = [
         "https://overpass.kumi.systems/api/interpreter",
         "https://overpass-api.de/api/interpreter",
@@ -45,47 +111,80 @@ def download_osm_data():
     print(f"   Bounding box: {BBOX}")
     print(f"   Query types: traffic_signals, stop signs, crossings")
     
-    for i, url in enumerate(urls, 1):
-        try:
-            print(f"\n🔄 Attempt {i}/{len(urls)} using {url.split('/')[2]}...")
-            response = requests.post(url, data={'data': OVERPASS_QUERY}, timeout=240)
-            response.raise_for_status()
+    # Create output directory if needed
+    os.makedirs(os.path.dirname(OUTPUT_FILE), exist_ok=True)
+    
+    session = make_session()
+    stop_event = threading.Event()
+    open_responses = set()
+    results = queue.Queue()
+    started = 0
+    finished = 0
+    
+    def start_next_mirror():
+        nonlocal started
+        url = urls[started]
+        print(f"\n🔄 Querying {url.split('/')[2]}...")
+        # Daemon threads: a mirror still computing the query can't hold up exit
+        threading.Thread(
+            target=_mirror_worker,
+            args=(session, url, f"{OUTPUT_FILE}.{started}.part", stop_event, open_responses, results),
+            daemon=True
+        ).start()
+        started += 1
+    
+    start_next_mirror()
+    try:
+        while finished < started:
+            try:
+                url, part_file, error = results.get(timeout=HEDGE_DELAY if started < len(urls) else None)
+            except queue.Empty:
+                print(f"   ⏳ No answer after {HEDGE_DELAY}s, also trying the next mirror")
+                start_next_mirror()
+                continue
             
-            # Create output directory if needed
-            os.makedirs(os.path.dirname(OUTPUT_FILE), exist_ok=True)
+            finished += 1
+            host = url.split('/')[2]
+            if error is not None:
+                if isinstance(error, requests.exceptions.Timeout):
+                    print(f"   ⏱️  {host}: timeout")
+                elif isinstance(error, requests.exceptions.RequestException):
+                    print(f"   ❌ {host}: {error}")
+                else:
+                    print(f"   ❌ {host}: unexpected error: {error}")
+                # Fail over straight away if nothing else is in flight
+                if finished == started and started < len(urls):
+                    start_next_mirror()
+                continue
+            if part_file is None:
+                continue
             
-            # Save to file
-            with open(OUTPUT_FILE, 'wb') as f:
-                f.write(response.content)
+            # First complete download wins
+            os.replace(part_file, OUTPUT_FILE)
             
             # Get file size
             size_mb = os.path.getsize(OUTPUT_FILE) / (1024 * 1024)
             
-            print(f"\n✅ Download complete!")
+            print(f"\n✅ Download complete from {host}!")
             print(f"   File: {OUTPUT_FILE}")
             print(f"   Size: {size_mb:.2f} MB")
             print(f"\nNext steps:")
-            print(f"1. Run: python ingest_osm_to_snowflake.py")
+            print(f"1. Run: python ingest_osm_to_snowflake.py {OUTPUT_FILE}")
             print(f"2. In Snowflake, run: SELECT COUNT(*) FROM RAW.REF_OSM_NODES WHERE SOURCE_FILE LIKE '%markham%';")
             print(f"3. In analytics dir, run: dbt run")
             return
-            
-        except requests.exceptions.Timeout:
-            print(f"   ⏱️  Timeout - trying next mirror...")
-            continue
-        except requests.exceptions.RequestException as e:
-            print(f"   ❌ Error: {e}")
-            if i < len(urls):
-                print(f"   Trying next mirror...")
-                continue
-        except Exception as e:
-            print(f"   ❌ Unexpected error: {e}")
-            break
+    finally:
+        # Stop the other mirrors: streaming ones at their next chunk, and close
+        # their connections so none sits in a blocking read
+        stop_event.set()
+        for response in list(open_responses):
+            response.close()
+        session.close()
     
     print("\n❌ All mirrors failed. You can download manually:")
     print(f"   1. Go to: https://overpass-turbo.eu/")
     print(f"   2. Paste the query (printed below)")
-    print(f"   3. Click 'Export' → 'Download as raw OSM data'")
+    print(f"   3. Click 'Export' → 'Download as raw OSM data' (JSON)")
     print(f"   4. Save as: {OUTPUT_FILE}")
     print(f"\nQuery:")
     print(OVERPASS_QUERY)
@@ -9,6 +9,9 @@ import subprocess
 from pathlib import Path
 import xml.etree.ElementTree as ET
 
+# highway=* values kept as traffic infrastructure, built once rather than per node
+TRAFFIC_HIGHWAY_VALUES = frozenset(['traffic_signals', 'stop', 'give_way', 'speed_camera'])
+
 def download_geofabrik_extract():
     """
     Download Toronto region from Geofabrik (BBBike extracts)
@@ -80,17 +83,10 @@ def filter_traffic_signs(input_file: str, output_file: str):
     for node in root.findall('.//node'):
         tags = {tag.get('k'): tag.get('v') for tag in node.findall('tag')}
         
-        # Keep nodes with traffic-related tags
-        if any(key in tags for key in [
-            'traffic_sign', 'highway', 'traffic_signals',
-            'direction', 'maxspeed'
-        ]):
-            if tags.get('highway') in ['traffic_signals', 'stop', 'give_way', 'speed_camera']:
-                osm_filtered.append(node)
-                traffic_count += 1
-            elif 'traffic_sign' in tags:
-                osm_filtered.append(node)
-                traffic_count += 1
+        # Keep traffic control highway nodes and anything with a traffic_sign tag
+        if tags.get('highway') in TRAFFIC_HIGHWAY_VALUES or 'traffic_sign' in tags:
+            osm_filtered.append(node)
+            traffic_count += 1
     
     # Write filtered XML
     filtered_tree = ET.ElementTree(osm_filtered)
@@ -1,60 +1,150 @@
 #!/usr/bin/env python3
 """
 OSM Ground Truth Ingestion to Snowflake
-Parses local osm.xml and uploads to REF_OSM_NODES table with GEOGRAPHY type
+Parses local osm.xml (or Overpass JSON) and uploads to REF_OSM_NODES table with GEOGRAPHY type
 """
 
 import xml.etree.ElementTree as ET
 import snowflake.connector
+import csv
+import gzip
 import json
+import sys
+import tempfile
 from datetime import datetime
 from pathlib import Path
 import os
 from dotenv import load_dotenv
 
+try:
+    from lxml import etree as lxml_etree
+except ImportError:  # lxml is optional; fall back to xml.etree
+    lxml_etree = None
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to json
+    orjson = None
+
 # Load environment variables
 load_dotenv()
 
+# OSM elements that sit directly under <osm>
+OSM_TOP_LEVEL_TAGS = ('node', 'way', 'relation')
+
+# Tag keys that mark a node as traffic infrastructure
+TRAFFIC_TAG_KEYS = ('traffic_sign', 'highway')
+
+def _dump_tags(tags: dict) -> str:
+    """Serialize a tag dict to a JSON string, using orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(tags).decode('utf-8')
+    return json.dumps(tags)
+
+def _load_json(f):
+    """Parse a JSON file opened in binary mode, using orjson when available."""
+    if orjson is not None:
+        return orjson.loads(f.read())
+    return json.load(f)
+
+def _iter_osm_nodes_etree(xml_file: str):
+    """Yield <node> elements from an OSM XML file using xml.etree iterparse."""
+    # Stream the file: hand out each <node> when it closes, then drop every finished
+    # top-level element so the tree never holds more than one of them
+    context = ET.iterparse(xml_file, events=('start', 'end'))
+    _, root = next(context)
+    
+    for event, elem in context:
+        if event != 'end' or elem.tag not in OSM_TOP_LEVEL_TAGS:
+            continue
+        if elem.tag == 'node':
+            yield elem
+        root.clear()
+
+def _iter_osm_nodes_lxml(xml_file: str):
+    """Yield <node> elements from an OSM XML file using lxml iterparse."""
+    # libxml2 only surfaces top-level elements to Python
+    context = lxml_etree.iterparse(xml_file, events=('end',), tag=OSM_TOP_LEVEL_TAGS)
+    for _, elem in context:
+        if elem.tag == 'node':
+            yield elem
+        
+        # Free the element and any already-processed siblings
+        elem.clear()
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
+
 def parse_osm_xml(xml_file: str) -> list:
     """
     Parse OSM XML file and extract traffic sign nodes
     
+    Uses lxml when it is installed and falls back to xml.etree otherwise.
+    
     Args:
         xml_file: Path to osm.xml file
     
     Returns:
         List of dicts with OSM node data
     """
-    tree = ET.parse(xml_file)
-    root = tree.getroot()
+    iter_osm_nodes = _iter_osm_nodes_lxml if lxml_etree is not None else _iter_osm_nodes_etree
     
     nodes = []
     
-    for node in root.findall('.//node'):
-        # Extract basic attributes
-        osm_id = node.get('id')
-        lat = float(node.get('lat'))
-        lon = float(node.get('lon'))
+    for node in iter_osm_nodes(xml_file):
+        # Most nodes carry neither key, so check the tag keys before building
+        # the tags dict or parsing coordinates
+        tag_attrs = [tag.attrib for tag in node.iterfind('tag')]
+        if not any(tag['k'] in TRAFFIC_TAG_KEYS for tag in tag_attrs):
+            continue
         
-        # Extract all tags
-        tags = {}
-        for tag in node.findall('tag'):
-            tags[tag.get('k')] = tag.get('v')
+        # Extract all tags (reading the attrib dicts directly)
+        tags = {tag['k']: tag['v'] for tag in tag_attrs}
         
-        # Filter for traffic signs
-        if 'traffic_sign' in tags or 'highway' in tags:
-            osm_type = tags.get('traffic_sign') or tags.get('highway', 'unknown')
-            
-            nodes.append({
-                'osm_id': osm_id,
-                'osm_type': osm_type,
-                'lat': lat,
-                'lon': lon,
-                'tags': tags
-            })
+        attrs = node.attrib
+        record = _traffic_node_record(attrs['id'], float(attrs['lat']), float(attrs['lon']), tags)
+        if record is not None:
+            nodes.append(record)
     
     return nodes
 
+def parse_osm_json(json_file: str) -> list:
+    """
+    Parse an Overpass API JSON response ([out:json]) and extract traffic sign nodes
+    
+    Args:
+        json_file: Path to the Overpass JSON file
+    
+    Returns:
+        List of dicts with OSM node data
+    """
+    with open(json_file, 'rb') as f:
+        elements = _load_json(f)['elements']
+    
+    nodes = []
+    for element in elements:
+        if element.get('type') != 'node':
+            continue
+        record = _traffic_node_record(str(element['id']), element['lat'], element['lon'],
+                                      element.get('tags', {}))
+        if record is not None:
+            nodes.append(record)
+    
+    return nodes
+
+def _traffic_node_record(osm_id: str, lat: float, lon: float, tags: dict):
+    """Build a node record if the tags mark traffic infrastructure, else None."""
+    # Filter for traffic signs
+    if not any(key in tags for key in TRAFFIC_TAG_KEYS):
+        return None
+    
+    return {
+        'osm_id': osm_id,
+        'osm_type': tags.get('traffic_sign') or tags.get('highway', 'unknown'),
+        'lat': lat,
+        'lon': lon,
+        'tags': tags
+    }
+
 def create_geography_point(lat: float, lon: float) -> str:
     """
     Create Snowflake GEOGRAPHY point from lat/lon
@@ -85,37 +175,45 @@ def upload_to_snowflake(nodes: list, source_file: str):
     try:
         print(f"🚀 Uploading {len(nodes)} OSM nodes to Snowflake...")
         
-        # Use executemany with batching for best performance
-        batch_size = 16384  # Snowflake's max batch size
-        total_inserted = 0
-        
-        insert_sql = """
-        INSERT INTO REF_OSM_NODES 
-        (OSM_ID, OSM_TYPE, LATITUDE, LONGITUDE, TAGS, UPLOADED_AT, SOURCE_FILE)
-        SELECT column1, column2, column3, column4, PARSE_JSON(column5), CURRENT_TIMESTAMP(), column6
-        FROM VALUES (%s, %s, %s, %s, %s, %s)
-        """
+        # Stage the nodes as one gzip CSV and bulk-load it with COPY INTO
+        # instead of binding parameters row by row
+        stage_name = f"osm_nodes_{datetime.now():%Y%m%d_%H%M%S}.csv.gz"
         
-        for i in range(0, len(nodes), batch_size):
-            batch = nodes[i:i+batch_size]
-            
-            # Prepare batch data
-            batch_data = [
-                (
-                    node['osm_id'],
-                    node['osm_type'],
-                    node['lat'],
-                    node['lon'],
-                    json.dumps(node['tags']),
-                    source_file
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            stage_file = Path(tmp_dir) / stage_name
+            with gzip.open(stage_file, 'wt', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerows(
+                    (
+                        node['osm_id'],
+                        node['osm_type'],
+                        node['lat'],
+                        node['lon'],
+                        _dump_tags(node['tags']),
+                        source_file
+                    )
+                    for node in nodes
                 )
-                for node in batch
-            ]
-            
-            cursor.executemany(insert_sql, batch_data)
-            total_inserted += len(batch)
             
-            print(f"✅ Inserted {total_inserted}/{len(nodes)} nodes")
+            cursor.execute(f"PUT 'file://{stage_file.as_posix()}' @%REF_OSM_NODES AUTO_COMPRESS=FALSE OVERWRITE=TRUE")
+        
+        cursor.execute(f"""
+        COPY INTO REF_OSM_NODES 
+        (OSM_ID, OSM_TYPE, LATITUDE, LONGITUDE, LOCATION, TAGS, UPLOADED_AT, SOURCE_FILE)
+        FROM (
+            SELECT $1, $2, $3, $4, ST_MAKEPOINT($4::FLOAT, $3::FLOAT),
+                   PARSE_JSON($5), CURRENT_TIMESTAMP()::TIMESTAMP_NTZ, $6
+            FROM @%REF_OSM_NODES
+        )
+        FILES = ('{stage_name}')
+        FILE_FORMAT = (TYPE = CSV FIELD_OPTIONALLY_ENCLOSED_BY = '"' COMPRESSION = GZIP)
+        PURGE = TRUE
+        """)
+        # One row per loaded file with rows_loaded in column 4; when no files
+        # are processed Snowflake returns a single status column instead
+        total_inserted = sum(row[3] for row in cursor.fetchall() if len(row) > 3)
+        
+        print(f"✅ Inserted {total_inserted}/{len(nodes)} nodes")
         
         conn.commit()
         
@@ -154,11 +252,15 @@ def main():
     # Check multiple locations for OSM file
     project_root = Path(__file__).parent.parent.parent
     
-    # Try data/ directory first (preferred location)
-    osm_file = project_root / 'data' / 'toronto_traffic.xml'
-    if not osm_file.exists():
-        # Fallback to local-mvp/osm.xml
-        osm_file = project_root / 'local-mvp' / 'osm.xml'
+    if len(sys.argv) > 1:
+        # Explicit path, e.g. a JSON file from download_markham_richmond_hill_osm.py
+        osm_file = Path(sys.argv[1])
+    else:
+        # Try data/ directory first (preferred location)
+        osm_file = project_root / 'data' / 'toronto_traffic.xml'
+        if not osm_file.exists():
+            # Fallback to local-mvp/osm.xml
+            osm_file = project_root / 'local-mvp' / 'osm.xml'
     
     if not osm_file.exists():
         print(f"❌ OSM file not found in expected locations:")
@@ -174,7 +276,10 @@ def main():
         return
     
     print(f"📖 Parsing {osm_file}...")
-    nodes = parse_osm_xml(str(osm_file))
+    if osm_file.suffix == '.json':
+        nodes = parse_osm_json(str(osm_file))
+    else:
+        nodes = parse_osm_xml(str(osm_file))
     
     if len(nodes) == 0:
         print("⚠️  No traffic infrastructure nodes found in OSM file.")
@@ -34,13 +34,17 @@ CREATE OR REPLACE TABLE REF_OSM_NODES (
     OSM_TYPE VARCHAR(50),           -- 'traffic_sign', 'traffic_light', etc.
     LATITUDE NUMBER(10, 7) NOT NULL,
     LONGITUDE NUMBER(10, 7) NOT NULL,
+    LOCATION GEOGRAPHY,             -- ST_MAKEPOINT(LONGITUDE, LATITUDE), set at ingest
     TAGS VARIANT,                   -- JSON object with all OSM tags
     UPLOADED_AT TIMESTAMP_NTZ,
     SOURCE_FILE VARCHAR(255)
 )
 COMMENT = 'OpenStreetMap ground truth for traffic infrastructure';
 
--- Note: GEOGRAPHY will be computed in views using TO_GEOGRAPHY(POINT(LONGITUDE LATITUDE))
+-- Note: LOCATION is stored once at ingest so spatial queries don't rebuild a point per row.
+-- Existing tables can be backfilled with:
+--   ALTER TABLE REF_OSM_NODES ADD COLUMN LOCATION GEOGRAPHY;
+--   UPDATE REF_OSM_NODES SET LOCATION = ST_MAKEPOINT(LONGITUDE, LATITUDE) WHERE LOCATION IS NULL;
 
 -- Note: Snowflake automatically optimizes GEOGRAPHY queries without explicit indexes
 -- Clustering can be added if needed: CLUSTER BY (LOCATION)
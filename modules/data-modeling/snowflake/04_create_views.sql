@@ -56,11 +56,50 @@ SELECT
 FROM STG_DETECTIONS
 WHERE RECORD_CONTENT IS NOT NULL;
 
+-- ============================================================================
+-- Typed Detection Columns for Ad-hoc Analysis
+-- Extracts the commonly queried JSON fields once, as FLOAT coordinates
+-- ============================================================================
+
+CREATE OR REPLACE VIEW STG_DETECTIONS_V AS
+SELECT
+    RECORD_CONTENT:detection_id::STRING AS detection_id,
+    RECORD_CONTENT:class_name::STRING AS class_name,
+    RECORD_CONTENT:vehicle_lat::FLOAT AS lat,
+    RECORD_CONTENT:vehicle_lon::FLOAT AS lon,
+    *
+FROM STG_DETECTIONS;
+
 -- ============================================================================
 -- Test Spatial Join (Detection within 50m of OSM node)
+-- Candidates are bucketed by H3 cell first (resolution 9, ~170m edges): each
+-- detection is only compared with OSM nodes in its own cell and the ring
+-- around it, which always covers the 50m radius
 -- ============================================================================
 
 CREATE OR REPLACE VIEW VW_DETECTION_OSM_PROXIMITY AS
+WITH det_cells AS (
+    SELECT
+        d.detection_id,
+        d.class_name,
+        d.vehicle_lat,
+        d.vehicle_lon,
+        d.vehicle_location,
+        ring.VALUE::INT AS cell
+    FROM VW_DETECTIONS_FLAT d,
+         LATERAL FLATTEN(input => H3_GRID_DISK(H3_POINT_TO_CELL(d.vehicle_location, 9), 1)) ring
+    WHERE d.vehicle_location IS NOT NULL
+),
+osm AS (
+    SELECT
+        OSM_ID,
+        OSM_TYPE,
+        LATITUDE,
+        LONGITUDE,
+        LOCATION,
+        H3_POINT_TO_CELL(LOCATION, 9) AS cell
+    FROM REF_OSM_NODES
+)
 SELECT
     d.detection_id,
     d.class_name,
@@ -70,17 +109,10 @@ SELECT
     o.OSM_TYPE,
     o.LATITUDE AS osm_lat,
     o.LONGITUDE AS osm_lon,
-    ST_DISTANCE(
-        d.vehicle_location,
-        TO_GEOGRAPHY('POINT(' || o.LONGITUDE || ' ' || o.LATITUDE || ')')
-    ) AS distance_meters
-FROM VW_DETECTIONS_FLAT d
-CROSS JOIN REF_OSM_NODES o
-WHERE d.vehicle_location IS NOT NULL
-  AND ST_DISTANCE(
-      d.vehicle_location,
-      TO_GEOGRAPHY('POINT(' || o.LONGITUDE || ' ' || o.LATITUDE || ')')
-  ) < 50  -- Within 50 meters
+    ST_DISTANCE(d.vehicle_location, o.LOCATION) AS distance_meters
+FROM det_cells d
+JOIN osm o ON o.cell = d.cell
+WHERE ST_DISTANCE(d.vehicle_location, o.LOCATION) < 50  -- Within 50 meters
 ORDER BY d.detection_id, distance_meters;
 
 -- ============================================================================
@@ -22,8 +22,8 @@ SELECT
     LATITUDE,
     LONGITUDE,
     ST_DISTANCE(
-        TO_GEOGRAPHY('POINT(' || LONGITUDE || ' ' || LATITUDE || ')'),
-        TO_GEOGRAPHY('POINT(-79.3140 43.7900)')  -- Example detection location
+        LOCATION,
+        ST_MAKEPOINT(-79.3140, 43.7900)  -- Example detection location
     ) AS distance_from_detection_meters
 FROM REF_OSM_NODES
 ORDER BY distance_from_detection_meters
@@ -0,0 +1,133 @@
+-- ============================================================================
+-- SentinelMap: Materialized Detection ↔ OSM Proximity Matches
+-- Purpose: Keep the 50m spatial join in a table refreshed by a task, so
+--          dashboards scan results instead of re-running the join
+-- ============================================================================
+
+-- Tasks need account-level EXECUTE TASK, granted by ACCOUNTADMIN
+USE ROLE ACCOUNTADMIN;
+GRANT EXECUTE TASK ON ACCOUNT TO ROLE SENTINEL_ROLE;
+GRANT CREATE STREAM ON SCHEMA SENTINEL_MAP.RAW TO ROLE SENTINEL_ROLE;
+GRANT CREATE TASK ON SCHEMA SENTINEL_MAP.RAW TO ROLE SENTINEL_ROLE;
+
+USE ROLE SENTINEL_ROLE;
+USE WAREHOUSE SENTINEL_WH;
+USE DATABASE SENTINEL_MAP;
+USE SCHEMA RAW;
+
+-- ============================================================================
+-- Match Table
+-- One row per (detection, OSM node within 50m); detections with no nearby
+-- node get a single row with NULL OSM columns
+-- ============================================================================
+
+CREATE OR REPLACE TABLE DETECTION_OSM_MATCHES (
+    DETECTION_ID VARCHAR(255),
+    CLASS_NAME VARCHAR(100),
+    DET_LAT FLOAT,
+    DET_LON FLOAT,
+    LOCATION GEOGRAPHY,             -- Detection point
+    OSM_ID VARCHAR(50),             -- NULL when nothing within 50m
+    OSM_TYPE VARCHAR(50),
+    OSM_LAT NUMBER(10, 7),
+    OSM_LON NUMBER(10, 7),
+    DISTANCE_METERS FLOAT,
+    REFRESHED_AT TIMESTAMP_NTZ
+)
+COMMENT = 'Detections joined to OSM nodes within 50 meters, maintained by REFRESH_DETECTION_OSM_MATCHES'
+CLUSTER BY (ST_GEOHASH(LOCATION, 7));  -- Co-locate nearby detections
+
+-- ============================================================================
+-- Change Stream
+-- SHOW_INITIAL_ROWS makes the first task run pick up existing detections
+-- ============================================================================
+
+CREATE OR REPLACE STREAM STG_DETECTIONS_MATCH_STREAM
+    ON TABLE STG_DETECTIONS
+    APPEND_ONLY = TRUE
+    SHOW_INITIAL_ROWS = TRUE;
+
+-- ============================================================================
+-- Refresh Task
+-- Only new detections are matched. OSM candidates are pruned to the
+-- detection's H3 cell and its neighbours (resolution 9, ~170m edges)
+-- before ST_DISTANCE runs.
+-- ============================================================================
+
+CREATE OR REPLACE TASK REFRESH_DETECTION_OSM_MATCHES
+    WAREHOUSE = SENTINEL_WH
+    SCHEDULE = '1 MINUTE'
+    WHEN SYSTEM$STREAM_HAS_DATA('STG_DETECTIONS_MATCH_STREAM')
+AS
+INSERT INTO DETECTION_OSM_MATCHES
+WITH det AS (
+    SELECT
+        RECORD_CONTENT:detection_id::STRING AS detection_id,
+        RECORD_CONTENT:class_name::STRING AS class_name,
+        RECORD_CONTENT:vehicle_lat::FLOAT AS det_lat,
+        RECORD_CONTENT:vehicle_lon::FLOAT AS det_lon,
+        ST_MAKEPOINT(det_lon, det_lat) AS location
+    FROM STG_DETECTIONS_MATCH_STREAM
+    WHERE RECORD_CONTENT:vehicle_lat IS NOT NULL
+      AND RECORD_CONTENT:vehicle_lon IS NOT NULL
+),
+det_cells AS (
+    SELECT det.detection_id, det.location, ring.VALUE::INT AS cell
+    FROM det,
+         LATERAL FLATTEN(input => H3_GRID_DISK(H3_LATLNG_TO_CELL(det.det_lat, det.det_lon, 9), 1)) ring
+),
+osm AS (
+    SELECT
+        OSM_ID,
+        OSM_TYPE,
+        LATITUDE,
+        LONGITUDE,
+        LOCATION,
+        H3_LATLNG_TO_CELL(LATITUDE, LONGITUDE, 9) AS cell
+    FROM REF_OSM_NODES
+),
+pairs AS (
+    SELECT
+        det_cells.detection_id,
+        osm.OSM_ID,
+        osm.OSM_TYPE,
+        osm.LATITUDE AS osm_lat,
+        osm.LONGITUDE AS osm_lon,
+        ST_DISTANCE(det_cells.location, osm.LOCATION) AS distance_meters
+    FROM det_cells
+    JOIN osm ON osm.cell = det_cells.cell
+    WHERE ST_DISTANCE(det_cells.location, osm.LOCATION) <= 50
+)
+SELECT
+    det.detection_id,
+    det.class_name,
+    det.det_lat,
+    det.det_lon,
+    det.location,
+    pairs.OSM_ID,
+    pairs.OSM_TYPE,
+    pairs.osm_lat,
+    pairs.osm_lon,
+    pairs.distance_meters,
+    CURRENT_TIMESTAMP()::TIMESTAMP_NTZ
+FROM det
+LEFT JOIN pairs ON pairs.detection_id = det.detection_id;
+
+-- Tasks are created suspended; resume it and run once to backfill now
+ALTER TASK REFRESH_DETECTION_OSM_MATCHES RESUME;
+EXECUTE TASK REFRESH_DETECTION_OSM_MATCHES;
+
+-- Note: after reloading REF_OSM_NODES, rebuild matches for all detections by
+-- re-running this script (recreating the stream re-emits existing rows).
+
+-- ============================================================================
+-- Verification
+-- ============================================================================
+
+SELECT
+    COUNT(DISTINCT DETECTION_ID) AS total_detections,
+    COUNT(DISTINCT IFF(OSM_ID IS NOT NULL, DETECTION_ID, NULL)) AS matched,
+    COUNT(OSM_ID) AS match_pairs
+FROM DETECTION_OSM_MATCHES;
+
+SHOW TASKS LIKE 'REFRESH_DETECTION_OSM_MATCHES';
@@ -10,10 +10,54 @@ from pathlib import Path
 from detect_and_extract import PerceptionPipeline
 import csv
 import os
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
+# Per-worker pipeline, created once by _init_pipeline so the model is loaded
+# once per process rather than once per video
+_pipeline = None
+
+
+def _init_pipeline(conf: float, device: str, precision: str, batch_size: int):
+    """Load the YOLO pipeline in a worker process"""
+    global _pipeline
+    _pipeline = PerceptionPipeline(
+        model_path="yolov8n.pt",
+        device=device,
+        conf_threshold=conf,
+        precision=precision,
+        batch_size=batch_size
+    )
+
+
+def _process_one(video_file: Path, output_patches_dir: str, sample_fps: int,
+                 batch_size: int):
+    """
+    Run the pipeline on a single video inside a worker process
+    
+    Returns:
+        (video name, detection rows, processed frame count, elapsed seconds)
+    """
+    video_start = time.time()
+    
+    # Collect rows in memory; they are pickled back to the parent, which
+    # writes them straight into the aggregate CSV
+    rows = []
+    stats = _pipeline.process_video(
+        video_path=str(video_file),
+        output_csv=None,
+        output_patches_dir=output_patches_dir,
+        sample_fps=sample_fps,
+        batch_size=batch_size,
+        on_detection=rows.append
+    )
+    
+    return video_file.name, rows, stats['processed_frames'], time.time() - video_start
+
+
 def process_batch(video_dir: str, output_csv: str, output_patches_dir: str, 
-                  conf: float = 0.5, sample_fps: int = 1, device: str = "mps"):
+                  conf: float = 0.5, sample_fps: int = 1, device: str = "mps",
+                  workers: int = 2, batch_size: int = 16, precision: str = "fp32"):
     """
     Process all MP4 videos in a directory
     
@@ -24,6 +68,10 @@ def process_batch(video_dir: str, output_csv: str, output_patches_dir: str,
         conf: Confidence threshold
         sample_fps: Sampling rate
         device: Inference device
+        workers: Number of videos processed concurrently, each worker
+            holding its own model
+        batch_size: Sampled frames per inference call
+        precision: Inference precision ('fp32', 'fp16' or 'int8')
     """
     video_path = Path(video_dir)
     
@@ -43,16 +91,9 @@ def process_batch(video_dir: str, output_csv: str, output_patches_dir: str,
     print(f"🎬 Found {len(video_files)} videos")
     print(f"📊 Output CSV: {output_csv}")
     print(f"🖼️  Output Patches: {output_patches_dir}")
-    print(f"⚙️  Confidence: {conf}, Sample FPS: {sample_fps}, Device: {device}")
+    print(f"⚙️  Confidence: {conf}, Sample FPS: {sample_fps}, Device: {device}, Workers: {workers}, Batch: {batch_size}, Precision: {precision}")
     print(f"───────────────────────────────────────────────────────────")
     
-    # Initialize pipeline once (model loaded only once)
-    pipeline = PerceptionPipeline(
-        model_path="yolov8n.pt",
-        device=device,
-        conf_threshold=conf
-    )
-    
     # Prepare output CSV
     os.makedirs(Path(output_csv).parent, exist_ok=True)
     os.makedirs(output_patches_dir, exist_ok=True)
@@ -63,8 +104,9 @@ def process_batch(video_dir: str, output_csv: str, output_patches_dir: str,
     total_time = 0
     video_stats = []
     
-    # Open output CSV for writing (append mode)
-    with open(output_csv, 'w', newline='') as csvfile:
+    # Open output CSV for writing with a 1 MB buffer; each video's rows
+    # are written in a single writerows call
+    with open(output_csv, 'w', newline='', buffering=1024 * 1024) as csvfile:
         csv_writer = csv.writer(csvfile)
         
         # Write header
@@ -74,55 +116,43 @@ def process_batch(video_dir: str, output_csv: str, output_patches_dir: str,
             'vehicle_lat', 'vehicle_lon', 'recording_timestamp'
         ])
         
-        # Process each video
-        for idx, video_file in enumerate(video_files, 1):
-            print(f"\n🎬 [{idx}/{len(video_files)}] Processing: {video_file.name}")
-            
-            video_start = time.time()
+        # Videos are independent, so decode and pre/post-processing in one
+        # worker overlap with inference in another. Only the parent writes
+        # to the aggregate CSV, in the original video order.
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_pipeline,
+            initargs=(conf, device, precision, batch_size)
+        ) as executor:
+            futures = [
+                executor.submit(_process_one, video_file, output_patches_dir, sample_fps, batch_size)
+                for video_file in video_files
+            ]
             
-            # Use a temporary CSV for this video
-            temp_csv = f"/tmp/temp_{video_file.stem}.csv"
-            
-            try:
-                pipeline.process_video(
-                    video_path=str(video_file),
-                    output_csv=temp_csv,
-                    output_patches_dir=output_patches_dir,
-                    sample_fps=sample_fps
-                )
-                
-                video_time = time.time() - video_start
-                
-                # Read temp CSV and append to main CSV (skip header)
-                detections_count = 0
-                with open(temp_csv, 'r') as temp_file:
-                    temp_reader = csv.reader(temp_file)
-                    next(temp_reader)  # Skip header
+            for idx, (video_file, future) in enumerate(zip(video_files, futures), 1):
+                try:
+                    name, rows, frames_processed, video_time = future.result()
+                    
+                    # Rows already carry the video name
+                    csv_writer.writerows(rows)
+                    detections_count = len(rows)
                     
-                    for row in temp_reader:
-                        # Prepend video name to each row
-                        csv_writer.writerow([video_file.name] + row)
-                        detections_count += 1
-                
-                # Update statistics
-                total_detections += detections_count
-                total_frames_processed += pipeline.total_detections  # Approximate
-                total_time += video_time
-                
-                video_stats.append({
-                    'name': video_file.name,
-                    'detections': detections_count,
-                    'time': video_time
-                })
-                
-                print(f"✅ {video_file.name}: {detections_count} detections in {video_time:.1f}s")
-                
-                # Clean up temp file
-                os.remove(temp_csv)
-                
-            except Exception as e:
-                print(f"❌ Error processing {video_file.name}: {e}")
-                continue
+                    # Update statistics
+                    total_detections += detections_count
+                    total_frames_processed += frames_processed
+                    total_time += video_time
+                    
+                    video_stats.append({
+                        'name': name,
+                        'detections': detections_count,
+                        'time': video_time
+                    })
+                    
+                    print(f"✅ [{idx}/{len(video_files)}] {name}: {detections_count} detections in {video_time:.1f}s")
+                    
+                except Exception as e:
+                    print(f"❌ Error processing {video_file.name}: {e}")
+                    continue
     
     # Print summary
     print(f"\n╔═══════════════════════════════════════════════════════════╗")
@@ -187,6 +217,25 @@ def main():
         choices=["mps", "cuda", "cpu"],
         help="Device for inference (default: mps)"
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=2,
+        help="Number of videos to process in parallel (default: 2)"
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=16,
+        help="Sampled frames per inference call (default: 16)"
+    )
+    parser.add_argument(
+        "--precision",
+        type=str,
+        default="fp32",
+        choices=["fp32", "fp16", "int8"],
+        help="Inference precision (default: fp32)"
+    )
     parser.add_argument(
         "--limit",
         type=int,
@@ -202,7 +251,10 @@ def main():
         output_patches_dir=args.output_patches,
         conf=args.conf,
         sample_fps=args.sample_fps,
-        device=args.device
+        device=args.device,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        precision=args.precision
     )
 
 
@@ -14,14 +14,167 @@ Hardware: Optimized for M4 MacBook Pro with MPS acceleration
 import argparse
 import csv
 import os
+import queue
+import threading
 import time
 from pathlib import Path
-from typing import List, Tuple, Optional
+from typing import Callable, List, Tuple, Optional
+
+# Cap OpenMP threads before NumPy/PyTorch load so OpenCV, Tesseract and the
+# model don't oversubscribe the cores (set OMP_NUM_THREADS to override)
+os.environ.setdefault("OMP_NUM_THREADS", "2")
 
 import cv2
 import numpy as np
 from ultralytics import YOLO
 
+from ocr_config import GPS_OCR_CONFIG, TIMESTAMP_OCR_CONFIG
+
+# Overlay ops run on small ROIs alongside decode and inference threads;
+# two OpenCV threads avoid contention, and OpenCL dispatch only adds overhead
+cv2.setNumThreads(2)
+cv2.ocl.setUseOpenCL(False)
+
+try:
+    import ffmpegcv
+except ImportError:  # ffmpegcv is optional; fall back to cv2.VideoCapture
+    ffmpegcv = None
+
+
+def open_video(video_path: str, device: str):
+    """Open a video for sequential reading
+    
+    On CUDA machines with ffmpegcv installed, frames are decoded by NVDEC on
+    the GPU; everywhere else OpenCV decodes on the CPU.
+    
+    Returns:
+        (capture, fps, total frame count)
+    """
+    if device == "cuda" and ffmpegcv is not None:
+        try:
+            cap = ffmpegcv.VideoCaptureNV(video_path, pix_fmt="bgr24")
+            return cap, cap.fps, cap.count
+        except Exception as e:
+            print(f"⚠️  NVDEC decode unavailable ({e}), using OpenCV")
+    
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError(f"Cannot open video: {video_path}")
+    return cap, cap.get(cv2.CAP_PROP_FPS), cap.get(cv2.CAP_PROP_FRAME_COUNT)
+
+
+# YOLOv8 input resolution (longest side); frames are downscaled to this once
+MODEL_INPUT_SIZE = 640
+
+
+def resize_for_model(frame: np.ndarray, input_size: int = MODEL_INPUT_SIZE) -> np.ndarray:
+    """Downscale a frame so its longest side is input_size (never upscales)
+    
+    YOLO letterboxes to this size anyway; doing the resize up front means
+    inference only ever copies and pads the small frame.
+    """
+    h, w = frame.shape[:2]
+    scale = input_size / max(h, w)
+    if scale >= 1:
+        return frame
+    return cv2.resize(frame, (round(w * scale), round(h * scale)), interpolation=cv2.INTER_LINEAR)
+
+
+def _decode_frames(
+    cap,
+    frame_interval: int,
+    frame_queue: queue.Queue,
+    stop_event: threading.Event
+):
+    """Decode sampled frames into frame_queue (runs in a background thread)
+    
+    Skipped frames are only grabbed, not converted to BGR, when the reader
+    supports it. Decoding and resizing release the GIL, so this overlaps with
+    OCR and inference in the caller.
+    Puts (frame_number, frame, model_frame) tuples, where model_frame is the
+    frame resized for YOLO, then (total_frames, None, None) at EOF. If
+    decoding raises, the exception is put in place of total_frames so the
+    consumer can re-raise it instead of waiting forever.
+    """
+    def put(item) -> bool:
+        # Give up once the consumer has stopped so the thread can exit
+        while not stop_event.is_set():
+            try:
+                frame_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    # ffmpegcv readers have no grab(); skip frames with read() there
+    grab = getattr(cap, "grab", None) or (lambda: cap.read()[0])
+    
+    frame_count = 0
+    end = None
+    try:
+        while not stop_event.is_set():
+            if frame_count % frame_interval != 0:
+                if not grab():
+                    break
+            else:
+                ret, frame = cap.read()
+                if not ret or not put((frame_count, frame, resize_for_model(frame))):
+                    break
+            frame_count += 1
+        end = frame_count
+    except Exception as e:
+        end = e
+    finally:
+        # Always end the stream, even on errors the consumer can't see otherwise
+        put((end if end is not None else frame_count, None, None))
+
+
+# Compiled models exported per (device, precision): Ultralytics export
+# format, file name kept next to the source weights, and export options.
+# TensorRT engines use dynamic shapes so the last, partial batch still fits.
+EXPORTED_MODELS = {
+    ("cuda", "fp16"): ("engine", "{stem}_fp16.engine", {"half": True, "dynamic": True}),   # TensorRT
+    ("cuda", "int8"): ("engine", "{stem}_int8.engine", {"int8": True, "dynamic": True}),   # TensorRT
+    ("mps", "int8"): ("coreml", "{stem}_int8.mlpackage", {"int8": True}),                  # Core ML / Neural Engine
+    ("cpu", "int8"): ("openvino", "{stem}_int8_openvino_model", {"int8": True}),           # OpenVINO
+}
+
+
+def load_model(model_path: str, device: str, precision: str = "fp32", batch_size: int = 16) -> YOLO:
+    """Load YOLOv8 weights, exporting a compiled model for the device if one applies
+    
+    fp16 on CUDA and int8 everywhere export once (TensorRT, Core ML or OpenVINO)
+    and reuse the artifact on later runs. Other combinations use the PyTorch
+    weights directly, with fp16 applied at inference time.
+    
+    Args:
+        model_path: Path to YOLOv8 .pt weights
+        device: 'mps', 'cuda' or 'cpu'
+        precision: 'fp32', 'fp16' or 'int8'
+        batch_size: Maximum batch size baked into the exported model
+        
+    Returns:
+        Loaded YOLO model
+    """
+    export = EXPORTED_MODELS.get((device, precision))
+    if export is None:
+        return YOLO(model_path)
+    
+    export_format, artifact, export_options = export
+    weights = Path(model_path)
+    artifact_path = weights.with_name(artifact.format(stem=weights.stem))
+    
+    if artifact_path.exists():
+        print(f"♻️  Reusing {precision.upper()} model: {artifact_path}")
+    else:
+        print(f"🔧 Exporting {precision.upper()} {export_format} model (one-time)...")
+        exported = Path(YOLO(model_path).export(format=export_format, batch=batch_size, **export_options))
+        # fp16 and int8 engines share Ultralytics' default name; keep them apart
+        if exported != artifact_path:
+            exported.rename(artifact_path)
+    
+    return YOLO(str(artifact_path))
+
 
 class PerceptionPipeline:
     """End-to-end perception pipeline for traffic sign detection"""
@@ -31,7 +184,9 @@ class PerceptionPipeline:
         model_path: str = "yolov8n.pt",
         device: str = "mps",
         conf_threshold: float = 0.25,
-        target_classes: List[str] = None
+        target_classes: List[str] = None,
+        precision: str = "fp32",
+        batch_size: int = 16
     ):
         """Initialize YOLOv8 model and configuration
         
@@ -40,18 +195,42 @@ class PerceptionPipeline:
             device: 'mps' for M4, 'cuda' for GPU, 'cpu' for CPU
             conf_threshold: Minimum detection confidence
             target_classes: List of classes to detect (default: traffic signs)
+            precision: 'fp32', 'fp16' (GPU only) or 'int8' (exported model)
+            batch_size: Inference batch size, used when exporting INT8 models
         """
-        print(f"🚀 Loading YOLOv8 model on {device}...")
-        self.model = YOLO(model_path)
+        if precision == "fp16" and device == "cpu":
+            print("⚠️  FP16 is not supported on CPU, using FP32")
+            precision = "fp32"
+        
+        print(f"🚀 Loading YOLOv8 model on {device} ({precision})...")
+        self.model = load_model(model_path, device, precision, batch_size)
+        self.half = precision == "fp16"
         self.device = device
         self.conf_threshold = conf_threshold
         self.target_classes = target_classes or ["stop sign", "traffic light"]
+        # Class IDs to keep, resolved once so boxes can be filtered on-device
+        self.target_class_ids = [
+            class_id for class_id, name in self.model.names.items()
+            if name in self.target_classes
+        ]
         
         # Performance metrics
         self.total_frames = 0
         self.total_detections = 0
         self.inference_times = []
         
+        # Scratch (gray, binary) buffers for overlay OCR, keyed by region shape
+        self._overlay_buffers = {}
+        
+    def _overlay_scratch(self, region: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Return reusable gray/binary buffers sized for an overlay region"""
+        shape = region.shape[:2]
+        buffers = self._overlay_buffers.get(shape)
+        if buffers is None:
+            buffers = (np.empty(shape, np.uint8), np.empty(shape, np.uint8))
+            self._overlay_buffers[shape] = buffers
+        return buffers
+    
     def extract_gps_from_frame(self, frame: np.ndarray, frame_number: int) -> Tuple[float, float, str]:
         """Extract GPS coordinates and recording timestamp from frame overlay
         
@@ -86,23 +265,26 @@ class PerceptionPipeline:
             timestamp_region = frame[h - overlay_height:h, w - timestamp_width:w]
             
             # Preprocess GPS region - simple binary threshold works best
-            gray_gps = cv2.cvtColor(gps_region, cv2.COLOR_BGR2GRAY)
-            _, binary_gps = cv2.threshold(gray_gps, 127, 255, cv2.THRESH_BINARY)
+            # (written into per-shape scratch buffers instead of new arrays each frame)
+            gray_gps, binary_gps = self._overlay_scratch(gps_region)
+            cv2.cvtColor(gps_region, cv2.COLOR_BGR2GRAY, dst=gray_gps)
+            cv2.threshold(gray_gps, 127, 255, cv2.THRESH_BINARY, dst=binary_gps)
             
             # Preprocess timestamp region
-            gray_ts = cv2.cvtColor(timestamp_region, cv2.COLOR_BGR2GRAY)
-            _, binary_ts = cv2.threshold(gray_ts, 127, 255, cv2.THRESH_BINARY)
+            gray_ts, binary_ts = self._overlay_scratch(timestamp_region)
+            cv2.cvtColor(timestamp_region, cv2.COLOR_BGR2GRAY, dst=gray_ts)
+            cv2.threshold(gray_ts, 127, 255, cv2.THRESH_BINARY, dst=binary_ts)
             
             # Run OCR
-            gps_text = pytesseract.image_to_string(binary_gps, config='--psm 6')
-            timestamp_text = pytesseract.image_to_string(binary_ts, config='--psm 6')
+            gps_text = pytesseract.image_to_string(binary_gps, config=GPS_OCR_CONFIG)
+            timestamp_text = pytesseract.image_to_string(binary_ts, config=TIMESTAMP_OCR_CONFIG)
             
             # Parse VIOFO format: N43.792879 W79.314193
             lat = None
             lon = None
             
             # Extract latitude
-            lat_match = re.search(r'[NS]\s*(\d+\.?\s*\d+)', gps_text, re.IGNORECASE)
+            lat_match = re.search(r'[NS][\s:]*(\d+\.?\s*\d+)', gps_text, re.IGNORECASE)
             if lat_match:
                 lat_str = lat_match.group(1).replace(' ', '').replace('\n', '')
                 lat = float(lat_str)
@@ -110,7 +292,7 @@ class PerceptionPipeline:
                     lat = -abs(lat)
             
             # Extract longitude
-            lon_match = re.search(r'[EW]\s*(\d+\.?\s*\d+)', gps_text, re.IGNORECASE)
+            lon_match = re.search(r'[EW][\s:]*(\d+\.?\s*\d+)', gps_text, re.IGNORECASE)
             if lon_match:
                 lon_str = lon_match.group(1).replace(' ', '').replace('\n', '')
                 lon = float(lon_str)
@@ -183,30 +365,32 @@ class PerceptionPipeline:
     def process_video(
         self,
         video_path: str,
-        output_csv: str,
+        output_csv: Optional[str],
         output_patches_dir: str,
-        sample_fps: int = 1
+        sample_fps: int = 1,
+        batch_size: int = 16,
+        on_detection: Optional[Callable[[list], None]] = None
     ) -> dict:
         """Process video and generate detections
         
         Args:
             video_path: Path to input video
-            output_csv: Path to output CSV file
+            output_csv: Path to output CSV file (unused when on_detection is given)
             output_patches_dir: Directory to save ROI patches
             sample_fps: Sampling rate (process 1 frame every N fps)
+            batch_size: Number of sampled frames sent to the model per call
+            on_detection: Optional callback receiving each detection row (same
+                columns as the CSV) instead of writing it to output_csv
             
         Returns:
             Processing statistics
         """
         print(f"📹 Processing video: {video_path}")
         
-        # Open video
-        cap = cv2.VideoCapture(video_path)
-        if not cap.isOpened():
-            raise ValueError(f"Cannot open video: {video_path}")
-        
-        video_fps = int(cap.get(cv2.CAP_PROP_FPS))
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        # Open video (GPU decode on CUDA when available)
+        cap, video_fps, total_frames = open_video(video_path, self.device)
+        video_fps = int(video_fps)
+        total_frames = int(total_frames)
         frame_interval = max(1, video_fps // sample_fps)
         
         print(f"🎬 Video FPS: {video_fps}, Total Frames: {total_frames}")
@@ -218,94 +402,152 @@ class PerceptionPipeline:
         # Get video name from path
         video_name = os.path.basename(video_path)
         
-        # Open CSV writer (append mode, write header only if new file)
-        file_exists = os.path.exists(output_csv)
-        csv_file = open(output_csv, 'a', newline='')
-        csv_writer = csv.writer(csv_file)
-        if not file_exists:
-            csv_writer.writerow([
-                'video_name', 'frame_number', 'timestamp_sec', 'u', 'v',
-                'confidence', 'class_name',
-                'vehicle_lat', 'vehicle_lon', 'recording_timestamp'
-            ])
+        # Rows go to the caller's callback, or to a CSV writer
+        # (append mode, write header only if new file); either way they are
+        # handed over once per inference batch. The 1 MB file buffer turns
+        # those per-batch writes into a few large syscalls.
+        csv_file = None
+        if on_detection is None:
+            file_exists = os.path.exists(output_csv)
+            csv_file = open(output_csv, 'a', newline='', buffering=1024 * 1024)
+            csv_writer = csv.writer(csv_file)
+            if not file_exists:
+                csv_writer.writerow([
+                    'video_name', 'frame_number', 'timestamp_sec', 'u', 'v',
+                    'confidence', 'class_name',
+                    'vehicle_lat', 'vehicle_lon', 'recording_timestamp'
+                ])
+            write_rows = csv_writer.writerows
+        else:
+            def write_rows(rows):
+                for row in rows:
+                    on_detection(row)
         
         frame_count = 0
         processed_count = 0
         detection_count = 0
         
+        # Sampled frames waiting for inference:
+        # (frame, model_frame, frame_number, lat, lon, timestamp)
+        pending = []
+        
         start_time = time.time()
         
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            # Sample frames
-            if frame_count % frame_interval != 0:
-                frame_count += 1
-                continue
+        def run_batch():
+            """Run YOLOv8 on the pending frames in one call and write their detections"""
+            nonlocal processed_count, detection_count
             
-            # Extract GPS and recording timestamp from frame overlay
-            vehicle_lat, vehicle_lon, recording_timestamp = self.extract_gps_from_frame(frame, frame_count)
-            
-            # Run YOLOv8 inference
+            frames = [item[1] for item in pending]
             inference_start = time.time()
-            results = self.model(frame, conf=self.conf_threshold, device=self.device, verbose=False)
+            results = self.model(frames, conf=self.conf_threshold, device=self.device, half=self.half, verbose=False)
             inference_time = time.time() - inference_start
-            self.inference_times.append(inference_time)
+            # Keep per-frame inference time so the reported average stays comparable
+            self.inference_times.extend([inference_time / len(frames)] * len(frames))
+            
+            batch_rows = []
             
-            # Process detections
-            for result in results:
+            # Results come back in input order, one per frame
+            for (frame, model_frame, frame_number, vehicle_lat, vehicle_lon, recording_timestamp), result in zip(pending, results):
+                # Keep only target classes while the boxes are still on the
+                # device, then copy the survivors to host once per tensor
                 boxes = result.boxes
-                for box in boxes:
-                    # Get detection data
-                    x1, y1, x2, y2 = map(int, box.xyxy[0].cpu().numpy())
-                    confidence = float(box.conf[0].cpu().numpy())
-                    class_id = int(box.cls[0].cpu().numpy())
+                keep = boxes.cls == -1
+                for class_id in self.target_class_ids:
+                    keep |= boxes.cls == class_id
+                boxes = boxes[keep]
+                # Boxes are in model_frame pixels; scale back to the full frame
+                box_scale = (
+                    frame.shape[1] / model_frame.shape[1],
+                    frame.shape[0] / model_frame.shape[0]
+                ) * 2
+                xyxy = (boxes.xyxy.cpu().numpy() * box_scale).astype(int)
+                confidences = boxes.conf.cpu().numpy()
+                class_ids = boxes.cls.cpu().numpy().astype(int)
+                
+                # Calculate bottom-center pixel coordinates for every box at once
+                us = (xyxy[:, 0] + xyxy[:, 2]) / 2
+                vs = xyxy[:, 3]  # Bottom edge
+                
+                # Per-frame columns are the same for every box; format them once
+                timestamp_str = f"{frame_number / video_fps:.3f}"
+                lat_str = f"{vehicle_lat:.6f}"
+                lon_str = f"{vehicle_lon:.6f}"
+                
+                for (x1, y1, x2, y2), u, v, confidence, class_id in zip(
+                    xyxy.tolist(), us.tolist(), vs.tolist(), confidences.tolist(), class_ids.tolist()
+                ):
                     class_name = result.names[class_id]
                     
-                    # Filter by target classes
-                    if class_name not in self.target_classes:
-                        continue
-                    
-                    # Calculate bottom-center pixel coordinates
-                    u = (x1 + x2) / 2
-                    v = y2  # Bottom edge
-                    
                     # Extract ROI patch
                     patch = self.extract_roi_patch(frame, (x1, y1, x2, y2))
-                    patch_filename = f"frame_{frame_count:06d}_det_{detection_count:04d}.jpg"
+                    patch_filename = f"frame_{frame_number:06d}_det_{detection_count:04d}.jpg"
                     patch_path = os.path.join(output_patches_dir, patch_filename)
                     cv2.imwrite(patch_path, patch)
                     
-                    # Write CSV row with video name
-                    timestamp_sec = frame_count / video_fps
-                    csv_writer.writerow([
+                    # Buffer detection row with video name
+                    batch_rows.append([
                         video_name,
-                        frame_count,
-                        f"{timestamp_sec:.3f}",
+                        frame_number,
+                        timestamp_str,
                         f"{u:.2f}",
                         f"{v:.2f}",
                         f"{confidence:.4f}",
                         class_name,
-                        f"{vehicle_lat:.6f}",
-                        f"{vehicle_lon:.6f}",
+                        lat_str,
+                        lon_str,
                         recording_timestamp
                     ])
                     
                     detection_count += 1
+                
+                processed_count += 1
+                
+                # Progress update
+                if processed_count % 100 == 0:
+                    elapsed = time.time() - start_time
+                    fps = processed_count / elapsed
+                    print(f"⏳ Processed {processed_count} frames, {detection_count} detections ({fps:.1f} FPS)")
             
-            processed_count += 1
-            frame_count += 1
+            write_rows(batch_rows)
+            pending.clear()
+        
+        # Decode in a background thread; the bounded queue keeps at most a
+        # couple of batches of frames in memory
+        frame_queue = queue.Queue(maxsize=2 * batch_size)
+        stop_event = threading.Event()
+        decoder = threading.Thread(
+            target=_decode_frames,
+            args=(cap, frame_interval, frame_queue, stop_event),
+            daemon=True
+        )
+        decoder.start()
+        
+        try:
+            while True:
+                frame_number, frame, model_frame = frame_queue.get()
+                if frame is None:
+                    if isinstance(frame_number, Exception):
+                        raise RuntimeError(f"Decoding failed for {video_path}") from frame_number
+                    frame_count = frame_number  # Total frames read
+                    break
+                
+                # Extract GPS and recording timestamp from frame overlay
+                vehicle_lat, vehicle_lon, recording_timestamp = self.extract_gps_from_frame(frame, frame_number)
+                
+                pending.append((frame, model_frame, frame_number, vehicle_lat, vehicle_lon, recording_timestamp))
+                if len(pending) >= batch_size:
+                    run_batch()
             
-            # Progress update
-            if processed_count % 100 == 0:
-                elapsed = time.time() - start_time
-                fps = processed_count / elapsed
-                print(f"⏳ Processed {processed_count} frames, {detection_count} detections ({fps:.1f} FPS)")
+            # Flush the final partial batch
+            if pending:
+                run_batch()
+        finally:
+            stop_event.set()
+            decoder.join()
         
         cap.release()
-        csv_file.close()
+        if csv_file is not None:
+            csv_file.close()
         
         # Calculate metrics
         elapsed_time = time.time() - start_time
@@ -332,7 +574,8 @@ class PerceptionPipeline:
         print(f"⏱️  Elapsed Time: {elapsed_time:.2f}s")
         print(f"🚀 Average FPS: {avg_fps:.2f}")
         print(f"⚡ Average Inference: {avg_inference_time*1000:.2f}ms")
-        print(f"📁 CSV Output: {output_csv}")
+        if csv_file is not None:
+            print(f"📁 CSV Output: {output_csv}")
         print(f"🖼️  ROI Patches: {output_patches_dir}")
         print("="*60)
         
@@ -386,6 +629,19 @@ def main():
         default=1,
         help="Sampling rate in FPS (default: 1)"
     )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=16,
+        help="Sampled frames per inference call; lower it if latency or memory is tight (default: 16)"
+    )
+    parser.add_argument(
+        "--precision",
+        type=str,
+        default="fp32",
+        choices=["fp32", "fp16", "int8"],
+        help="Inference precision; int8 (and fp16 on CUDA) exports a TensorRT/Core ML/OpenVINO model once (default: fp32)"
+    )
     
     args = parser.parse_args()
     
@@ -393,7 +649,9 @@ def main():
     pipeline = PerceptionPipeline(
         model_path=args.model,
         device=args.device,
-        conf_threshold=args.conf
+        conf_threshold=args.conf,
+        precision=args.precision,
+        batch_size=args.batch_size
     )
     
     # Process video
@@ -401,7 +659,8 @@ def main():
         video_path=args.video,
         output_csv=args.output_csv,
         output_patches_dir=args.output_patches,
-        sample_fps=args.sample_fps
+        sample_fps=args.sample_fps,
+        batch_size=args.batch_size
     )
 
 
@@ -0,0 +1,13 @@
+"""
+Tesseract settings shared by the perception scripts for dashcam overlay OCR
+"""
+
+# Characters the overlays can contain: hemisphere letters, degree signs and
+# separators on the GPS/speed line, and date/time separators on the timestamp
+GPS_OCR_WHITELIST = '0123456789NSEWKMH:/.°'
+TIMESTAMP_OCR_WHITELIST = '0123456789/:-'
+
+# LSTM engine, single text line (no page layout analysis) and only the
+# characters the overlay uses
+GPS_OCR_CONFIG = f'--oem 1 --psm 7 -c tessedit_char_whitelist={GPS_OCR_WHITELIST}'
+TIMESTAMP_OCR_CONFIG = f'--oem 1 --psm 7 -c tessedit_char_whitelist={TIMESTAMP_OCR_WHITELIST}'
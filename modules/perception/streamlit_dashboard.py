@@ -6,9 +6,10 @@ Connects directly to Snowflake (no dbt required)
 """
 
 import streamlit as st
+import streamlit.components.v1 as components
 import pandas as pd
 import folium
-from streamlit_folium import st_folium
+from folium.plugins import FastMarkerCluster
 import snowflake.connector
 from pathlib import Path
 import os
@@ -66,7 +67,10 @@ SNOWFLAKE_ACCOUNT=your_account.region
             account=account,
             warehouse=os.getenv('SNOWFLAKE_WAREHOUSE', 'SENTINEL_WH'),
             database=os.getenv('SNOWFLAKE_DATABASE', 'SENTINEL_MAP'),
-            schema=os.getenv('SNOWFLAKE_SCHEMA', 'RAW')
+            schema=os.getenv('SNOWFLAKE_SCHEMA', 'RAW'),
+            # Keep the cached session alive between reruns
+            client_session_keep_alive=True,
+            client_prefetch_threads=4
         )
         return conn
     except Exception as e:
@@ -74,34 +78,124 @@ SNOWFLAKE_ACCOUNT=your_account.region
         st.info("💡 Check modules/data-modeling/.env configuration")
         return None
 
-@st.cache_data(ttl=10)  # Refresh every 10 seconds
-def load_detections(_conn):
-    """Load latest detections from Snowflake"""
-    if _conn is None:
-        return pd.DataFrame()
+def _lower_columns(df):
+    """Lower-case column names in place (Snowflake upper-cases unquoted aliases)"""
+    df.columns = df.columns.str.lower()
+    return df
+
+def fetch_dataframe(conn, query):
+    """Run a query and fetch the result as a DataFrame from Arrow batches
     
-    query = """
-    SELECT 
-        RECORD_CONTENT:detection_id::STRING AS detection_id,
-        RECORD_CONTENT:class_name::STRING AS class_name,
-        RECORD_CONTENT:vehicle_lat::FLOAT AS lat,
-        RECORD_CONTENT:vehicle_lon::FLOAT AS lon,
-        RECORD_CONTENT:recording_timestamp::STRING AS timestamp,
-        RECORD_CONTENT:confidence::FLOAT AS confidence,
-        INGESTED_AT
-    FROM STG_DETECTIONS
-    WHERE RECORD_CONTENT:vehicle_lat IS NOT NULL
-      AND RECORD_CONTENT:vehicle_lon IS NOT NULL
-    ORDER BY INGESTED_AT DESC
-    LIMIT 1000
+    Column names are returned in lower case.
     """
+    cur = conn.cursor()
+    try:
+        cur.execute(query)
+        return _lower_columns(cur.fetch_pandas_all())
+    finally:
+        cur.close()
+
+def fetch_dataframes(conn, *queries):
+    """Run several queries concurrently and fetch each result as a DataFrame
     
+    Every query is submitted with execute_async before any result is read,
+    so Snowflake compiles and runs them in parallel. Column names are
+    returned in lower case.
+    
+    Queries succeed or fail independently: the returned list holds a
+    DataFrame per query, or the exception that query raised. Every query
+    that was submitted is collected, even if a later one failed to submit.
+    """
+    cursors = []
+    results = []
     try:
-        df = pd.read_sql(query, _conn)
-        return df
-    except Exception as e:
-        st.error(f"Error loading detections: {e}")
-        return pd.DataFrame()
+        for query in queries:
+            cur = conn.cursor()
+            cursors.append(cur)
+            try:
+                cur.execute_async(query)
+                results.append(None)
+            except Exception as e:
+                results.append(e)
+        
+        for i, cur in enumerate(cursors):
+            if results[i] is not None:
+                continue
+            try:
+                cur.get_results_from_sfqid(cur.sfqid)
+                results[i] = _lower_columns(cur.fetch_pandas_all())
+            except Exception as e:
+                results[i] = e
+        return results
+    finally:
+        for cur in cursors:
+            cur.close()
+
+def _shrink(df, category_columns, float_columns):
+    """Store repeated labels as categories and coordinates/confidence as float32
+    
+    float32 keeps GPS coordinates to well under a metre here, far inside the
+    50m matching tolerance.
+    """
+    for col in category_columns:
+        df[col] = df[col].astype('category')
+    for col in float_columns:
+        df[col] = df[col].astype('float32')
+    return df
+
+# Latest detections (refreshed every 10 seconds)
+DETECTIONS_QUERY = """
+SELECT 
+    RECORD_CONTENT:detection_id::STRING AS detection_id,
+    RECORD_CONTENT:class_name::STRING AS class_name,
+    RECORD_CONTENT:vehicle_lat::FLOAT AS lat,
+    RECORD_CONTENT:vehicle_lon::FLOAT AS lon,
+    RECORD_CONTENT:recording_timestamp::STRING AS timestamp,
+    RECORD_CONTENT:confidence::FLOAT AS confidence,
+    INGESTED_AT
+FROM STG_DETECTIONS
+WHERE RECORD_CONTENT:vehicle_lat IS NOT NULL
+  AND RECORD_CONTENT:vehicle_lon IS NOT NULL
+ORDER BY INGESTED_AT DESC
+LIMIT 1000
+"""
+
+# Proximity matching statistics. Matches are maintained by the
+# REFRESH_DETECTION_OSM_MATCHES task (snowflake/07_create_match_table.sql);
+# one row per detection/OSM pair
+MATCH_STATS_QUERY = """
+SELECT 
+    COUNT(DISTINCT DETECTION_ID) AS total_detections,
+    COUNT(DISTINCT IFF(OSM_ID IS NOT NULL, DETECTION_ID, NULL)) AS matched,
+    COUNT(DISTINCT DETECTION_ID)
+        - COUNT(DISTINCT IFF(OSM_ID IS NOT NULL, DETECTION_ID, NULL)) AS unmatched,
+    ROUND(COUNT(OSM_ID) / NULLIF(COUNT(DISTINCT DETECTION_ID), 0), 2) AS avg_nearby_osm
+FROM DETECTION_OSM_MATCHES
+"""
+
+@st.cache_data(ttl=10)  # Refresh every 10 seconds
+def load_live_data(_conn):
+    """Load latest detections and match statistics with one concurrent round trip
+    
+    Returns:
+        (detections DataFrame, statistics row or None)
+    """
+    if _conn is None:
+        return pd.DataFrame(), None
+    
+    detections_df, stats_df = fetch_dataframes(_conn, DETECTIONS_QUERY, MATCH_STATS_QUERY)
+    if isinstance(detections_df, Exception):
+        st.error(f"Error loading detections: {detections_df}")
+        return pd.DataFrame(), None
+    
+    # Statistics are optional (e.g. DETECTION_OSM_MATCHES not created yet);
+    # without them only the sidebar metrics are hidden
+    if isinstance(stats_df, Exception):
+        st.error(f"Error loading statistics: {stats_df}")
+        stats = None
+    else:
+        stats = stats_df.iloc[0] if not stats_df.empty else None
+    return _shrink(detections_df, ('class_name',), ('lat', 'lon', 'confidence')), stats
 
 @st.cache_data(ttl=300)  # Refresh every 5 minutes (OSM data rarely changes)
 def load_osm_nodes(_conn):
@@ -109,7 +203,10 @@ def load_osm_nodes(_conn):
     if _conn is None:
         return pd.DataFrame()
     
-    query = """
+    # Only nodes in H3 cells (resolution 7, ~1.2km edges, plus one ring)
+    # around the same latest detections the map shows, so the area stays
+    # bounded as STG_DETECTIONS grows and no row cap is needed
+    query = f"""
     SELECT 
         OSM_ID,
         OSM_TYPE,
@@ -117,64 +214,111 @@ def load_osm_nodes(_conn):
         LONGITUDE AS lon,
         TAGS
     FROM REF_OSM_NODES
-    LIMIT 10000
+    WHERE H3_LATLNG_TO_CELL(LATITUDE, LONGITUDE, 7) IN (
+        SELECT DISTINCT ring.VALUE::INT
+        FROM ({DETECTIONS_QUERY}) d,
+             LATERAL FLATTEN(input => H3_GRID_DISK(H3_LATLNG_TO_CELL(d.lat, d.lon, 7), 1)) ring
+    )
     """
     
     try:
-        df = pd.read_sql(query, _conn)
-        return df
+        df = fetch_dataframe(_conn, query)
+        return _shrink(df, ('osm_type',), ('lat', 'lon'))
     except Exception as e:
         st.error(f"Error loading OSM data: {e}")
         return pd.DataFrame()
 
-@st.cache_data(ttl=10)
-def load_match_statistics(_conn):
-    """Load proximity matching statistics"""
-    if _conn is None:
-        return pd.DataFrame()
+@st.cache_data(max_entries=4)  # Keyed on the data signatures; keep a few recent maps
+def build_map_html(det_sig, osm_sig, _detections_df, _osm_df):
+    """Render the detections vs. OSM map to standalone HTML (cached)
     
-    query = """
-    WITH detections AS (
-        SELECT 
-            RECORD_CONTENT:detection_id::STRING AS detection_id,
-            RECORD_CONTENT:class_name::STRING AS class_name,
-            TO_GEOGRAPHY(ST_MAKEPOINT(
-                RECORD_CONTENT:vehicle_lon::FLOAT, 
-                RECORD_CONTENT:vehicle_lat::FLOAT
-            )) AS location
-        FROM STG_DETECTIONS
-        WHERE RECORD_CONTENT:vehicle_lat IS NOT NULL
-          AND RECORD_CONTENT:vehicle_lon IS NOT NULL
-    ),
-    osm_nodes AS (
-        SELECT 
-            TO_GEOGRAPHY(ST_MAKEPOINT(LONGITUDE, LATITUDE)) AS location
-        FROM REF_OSM_NODES
-    ),
-    matches AS (
-        SELECT 
-            d.detection_id,
-            d.class_name,
-            COUNT(o.location) AS nearby_osm_count
-        FROM detections d
-        LEFT JOIN osm_nodes o
-            ON ST_DISTANCE(d.location, o.location) <= 50
-        GROUP BY d.detection_id, d.class_name
-    )
-    SELECT 
-        COUNT(*) AS total_detections,
-        SUM(CASE WHEN nearby_osm_count > 0 THEN 1 ELSE 0 END) AS matched,
-        SUM(CASE WHEN nearby_osm_count = 0 THEN 1 ELSE 0 END) AS unmatched,
-        ROUND(AVG(nearby_osm_count), 2) AS avg_nearby_osm
-    FROM matches
+    The DataFrames are not hashed; det_sig and osm_sig identify the data, so
+    the map is only rebuilt when new detections or OSM nodes arrive.
     """
+    detections_df = _detections_df
+    osm_df = _osm_df
     
-    try:
-        df = pd.read_sql(query, _conn)
-        return df.iloc[0] if not df.empty else None
-    except Exception as e:
-        st.error(f"Error loading statistics: {e}")
-        return None
+    # Calculate map center (average of detection coordinates)
+    center_lat = detections_df['lat'].mean()
+    center_lon = detections_df['lon'].mean()
+    
+    # Create map
+    m = folium.Map(
+        location=[center_lat, center_lon],
+        zoom_start=13,
+        tiles='OpenStreetMap'
+    )
+    
+    # Add OSM nodes (green) as one clustered layer; markers are
+    # created client-side from the raw [lat, lon, type] arrays
+    if not osm_df.empty:
+        osm_points = osm_df[['lat', 'lon', 'osm_type']].values.tolist()
+        FastMarkerCluster(
+            osm_points,
+            name='OSM',
+            callback="""
+            function (row) {
+                return L.circleMarker(new L.LatLng(row[0], row[1]), {
+                    radius: 4, color: 'green', fill: true,
+                    fillColor: 'green', fillOpacity: 0.6
+                }).bindPopup('OSM: ' + row[2]);
+            }
+            """
+        ).add_to(m)
+    
+    # Add detections (red) as a single GeoJSON FeatureCollection
+    features = [
+        {
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [lon, lat]},
+            'properties': {
+                'class_name': class_name,
+                'confidence': f"{confidence:.2f}",
+                'timestamp': timestamp,
+                'gps': f"({lat:.6f}, {lon:.6f})"
+            }
+        }
+        for lat, lon, class_name, confidence, timestamp in zip(
+            detections_df['lat'].tolist(),
+            detections_df['lon'].tolist(),
+            detections_df['class_name'].tolist(),
+            detections_df['confidence'].tolist(),
+            detections_df['timestamp'].tolist()
+        )
+    ]
+    detections_geojson = {'type': 'FeatureCollection', 'features': features}
+    
+    # 50m proximity circles (semi-transparent), drawn below the markers
+    folium.GeoJson(
+        detections_geojson,
+        name='Proximity',
+        marker=folium.Circle(
+            radius=50,  # meters
+            color='blue',
+            fill=True,
+            fill_opacity=0.1,
+            weight=1
+        )
+    ).add_to(m)
+    
+    # Main detection markers
+    folium.GeoJson(
+        detections_geojson,
+        name='Detections',
+        marker=folium.CircleMarker(
+            radius=6,
+            color='red',
+            fill=True,
+            fill_color='red',
+            fill_opacity=0.8
+        ),
+        popup=folium.GeoJsonPopup(
+            fields=['class_name', 'confidence', 'timestamp', 'gps'],
+            aliases=['Class', 'Confidence', 'Time', 'GPS']
+        )
+    ).add_to(m)
+    
+    return m.get_root().render()
 
 # Connect to Snowflake
 conn = get_snowflake_connection()
@@ -182,9 +326,8 @@ conn = get_snowflake_connection()
 if conn:
     # Load data
     with st.spinner("Loading data from Snowflake..."):
-        detections_df = load_detections(conn)
+        detections_df, stats = load_live_data(conn)
         osm_df = load_osm_nodes(conn)
-        stats = load_match_statistics(conn)
     
     # Sidebar - Statistics
     st.sidebar.header("📊 Live Statistics")
@@ -212,7 +355,7 @@ if conn:
     st.sidebar.markdown("---")
     st.sidebar.header("🔄 Data Freshness")
     if not detections_df.empty:
-        latest = pd.to_datetime(detections_df['INGESTED_AT'].max())
+        latest = pd.to_datetime(detections_df['ingested_at'].max())
         st.sidebar.write(f"Latest detection: {latest.strftime('%Y-%m-%d %H:%M:%S')}")
     
     # Main content - Map
@@ -222,61 +365,13 @@ if conn:
         st.subheader("🗺️ Interactive Map: Detections vs. Ground Truth")
         
         if not detections_df.empty:
-            # Calculate map center (average of detection coordinates)
-            center_lat = detections_df['lat'].mean()
-            center_lon = detections_df['lon'].mean()
-            
-            # Create map
-            m = folium.Map(
-                location=[center_lat, center_lon],
-                zoom_start=13,
-                tiles='OpenStreetMap'
-            )
-            
-            # Add OSM nodes (green)
-            if not osm_df.empty:
-                for _, row in osm_df.iterrows():
-                    folium.CircleMarker(
-                        location=[row['lat'], row['lon']],
-                        radius=4,
-                        color='green',
-                        fill=True,
-                        fillColor='green',
-                        fillOpacity=0.6,
-                        popup=f"OSM: {row['OSM_TYPE']}"
-                    ).add_to(m)
-            
-            # Add detections (red)
-            for _, row in detections_df.iterrows():
-                # Main detection marker
-                folium.CircleMarker(
-                    location=[row['lat'], row['lon']],
-                    radius=6,
-                    color='red',
-                    fill=True,
-                    fillColor='red',
-                    fillOpacity=0.8,
-                    popup=f"""
-                    <b>Detection</b><br>
-                    Class: {row['class_name']}<br>
-                    Confidence: {row['confidence']:.2f}<br>
-                    Time: {row['timestamp']}<br>
-                    GPS: ({row['lat']:.6f}, {row['lon']:.6f})
-                    """
-                ).add_to(m)
-                
-                # 50m proximity circle (semi-transparent)
-                folium.Circle(
-                    location=[row['lat'], row['lon']],
-                    radius=50,  # meters
-                    color='blue',
-                    fill=True,
-                    fillOpacity=0.1,
-                    weight=1
-                ).add_to(m)
+            # Rebuild the map only when the underlying data changes
+            det_sig = (len(detections_df), str(detections_df['ingested_at'].max()))
+            osm_sig = len(osm_df)
+            map_html = build_map_html(det_sig, osm_sig, detections_df, osm_df)
             
             # Display map
-            st_folium(m, width=900, height=600)
+            components.html(map_html, width=900, height=600)
         else:
             st.warning("⚠️ No detections found. Process videos and publish to Kafka first.")
             st.code("""
@@ -295,11 +390,13 @@ cd modules/ingestion
         if not detections_df.empty:
             # Show latest 10 detections
             recent = detections_df.head(10)[['class_name', 'confidence', 'timestamp', 'lat', 'lon']]
-            recent['confidence'] = recent['confidence'].apply(lambda x: f"{x:.2f}")
-            recent['lat'] = recent['lat'].apply(lambda x: f"{x:.5f}")
-            recent['lon'] = recent['lon'].apply(lambda x: f"{x:.5f}")
             
-            st.dataframe(recent, hide_index=True, height=600)
+            # Format at render time instead of converting columns to strings
+            st.dataframe(
+                recent.style.format({'confidence': '{:.2f}', 'lat': '{:.5f}', 'lon': '{:.5f}'}),
+                hide_index=True,
+                height=600
+            )
         else:
             st.info("No recent detections")
     
@@ -326,48 +423,24 @@ cd modules/ingestion
         st.subheader("Proximity Matching Results")
         if conn:
             match_query = """
-            WITH detections AS (
-                SELECT 
-                    RECORD_CONTENT:detection_id::STRING AS detection_id,
-                    RECORD_CONTENT:class_name::STRING AS class_name,
-                    RECORD_CONTENT:vehicle_lat::FLOAT AS det_lat,
-                    RECORD_CONTENT:vehicle_lon::FLOAT AS det_lon,
-                    TO_GEOGRAPHY(ST_MAKEPOINT(
-                        RECORD_CONTENT:vehicle_lon::FLOAT, 
-                        RECORD_CONTENT:vehicle_lat::FLOAT
-                    )) AS location
-                FROM STG_DETECTIONS
-                WHERE RECORD_CONTENT:vehicle_lat IS NOT NULL
-                LIMIT 100
-            ),
-            osm_nodes AS (
-                SELECT 
-                    OSM_ID,
-                    OSM_TYPE,
-                    LATITUDE AS osm_lat,
-                    LONGITUDE AS osm_lon,
-                    TO_GEOGRAPHY(ST_MAKEPOINT(LONGITUDE, LATITUDE)) AS location
-                FROM REF_OSM_NODES
-            )
             SELECT 
-                d.detection_id,
-                d.class_name,
-                d.det_lat,
-                d.det_lon,
-                o.OSM_ID,
-                o.OSM_TYPE,
-                o.osm_lat,
-                o.osm_lon,
-                ROUND(ST_DISTANCE(d.location, o.location), 2) AS distance_meters
-            FROM detections d
-            JOIN osm_nodes o
-                ON ST_DISTANCE(d.location, o.location) <= 50
+                DETECTION_ID,
+                CLASS_NAME,
+                DET_LAT,
+                DET_LON,
+                OSM_ID,
+                OSM_TYPE,
+                OSM_LAT,
+                OSM_LON,
+                ROUND(DISTANCE_METERS, 2) AS distance_meters
+            FROM DETECTION_OSM_MATCHES
+            WHERE OSM_ID IS NOT NULL
             ORDER BY distance_meters
             LIMIT 50
             """
             
             try:
-                matches_df = pd.read_sql(match_query, conn)
+                matches_df = fetch_dataframe(conn, match_query)
                 if not matches_df.empty:
                     st.dataframe(matches_df, height=400)
                     st.success(f"✅ Found {len(matches_df)} proximity matches within 50 meters")
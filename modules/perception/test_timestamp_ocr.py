@@ -2,24 +2,79 @@
 """
 Test OCR extraction including timestamp from video overlay
 """
+import os
+
+# Cap OpenMP threads before NumPy loads (set OMP_NUM_THREADS to override)
+os.environ.setdefault("OMP_NUM_THREADS", "2")
+
 import cv2
 import numpy as np
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-def extract_gps_and_timestamp_from_frame(frame: np.ndarray, debug: bool = False) -> tuple:
+from ocr_config import (GPS_OCR_CONFIG, GPS_OCR_WHITELIST,
+                        TIMESTAMP_OCR_CONFIG, TIMESTAMP_OCR_WHITELIST)
+
+try:
+    import tesserocr
+except ImportError:  # tesserocr is optional; fall back to pytesseract
+    tesserocr = None
+
+# Keep OpenCV to two threads alongside the OCR pool; no OpenCL for small ROIs
+cv2.setNumThreads(2)
+cv2.ocl.setUseOpenCL(False)
+
+# Overlay parsing patterns, compiled once rather than per frame
+LAT_RE = re.compile(r'[NS][\s:]*(\d+\.?\s*\d+)', re.IGNORECASE)
+LON_RE = re.compile(r'[EW][\s:]*(\d+\.?\s*\d+)', re.IGNORECASE)
+SPEED_RE = re.compile(r'(\d+)\s*KM/H', re.IGNORECASE)
+TIMESTAMP_RES = [
+    re.compile(r'(\d{2}/\d{2}/\d{4}\s+\d{2}:\d{2}:\d{2})'),  # DD/MM/YYYY HH:MM:SS (VIOFO format)
+    re.compile(r'(\d{4}[-/]\d{2}[-/]\d{2}\s+\d{2}:\d{2}:\d{2})'),  # YYYY-MM-DD HH:MM:SS or YYYY/MM/DD HH:MM:SS
+    re.compile(r'(\d{2}/\d{2}/\d{4})'),  # DD/MM/YYYY (date only)
+    re.compile(r'(\d{4}[-/]\d{2}[-/]\d{2})'),  # YYYY-MM-DD or YYYY/MM/DD (date only)
+]
+
+# Both OCR backends release the GIL (pytesseract waits on a tesseract
+# subprocess, tesserocr calls into libtesseract), so the GPS and timestamp
+# regions can be OCR'd in parallel threads
+_ocr_pool = ThreadPoolExecutor(max_workers=2)
+
+# One persistent tesserocr API per OCR thread, so the model loads once
+_tess_local = threading.local()
+
+
+def _tesserocr_text(image: np.ndarray, whitelist: str) -> str:
+    """OCR a binarized single-line image with this thread's tesserocr API"""
+    api = getattr(_tess_local, 'api', None)
+    if api is None:
+        api = tesserocr.PyTessBaseAPI(psm=tesserocr.PSM.SINGLE_LINE, oem=tesserocr.OEM.LSTM_ONLY)
+        _tess_local.api = api
+    
+    api.SetVariable('tessedit_char_whitelist', whitelist)
+    h, w = image.shape[:2]
+    api.SetImageBytes(np.ascontiguousarray(image).tobytes(), w, h, 1, w)
+    return api.GetUTF8Text()
+
+
+# Green levels for overlay change detection: glyph cores (white text) are at
+# least GLYPH_LEVEL, and a pixel only counts as changed when it moves between
+# a glyph core and clearly darker BACKGROUND_LEVEL, so antialiased glyph edges
+# blending with the moving scene don't register as text changes
+GLYPH_LEVEL = 230
+BACKGROUND_LEVEL = 160
+
+
+def overlay_regions(frame: np.ndarray) -> tuple:
     """
-    Extract GPS coordinates and timestamp from VIOFO A119 V3 frame overlay
+    Crop the GPS (bottom-left) and timestamp (bottom-right) overlays as views
     
     Returns:
-        (latitude, longitude, heading, timestamp) tuple
+        (gps_region, timestamp_region) BGR images
     """
-    try:
-        import pytesseract
-    except ImportError:
-        print("⚠️  pytesseract not installed")
-        return None, None, None, None
-    
     h, w = frame.shape[:2]
     
     # Extract bottom-left region (GPS)
@@ -31,16 +86,65 @@ def extract_gps_and_timestamp_from_frame(frame: np.ndarray, debug: bool = False)
     timestamp_width = int(w * 0.25)
     timestamp_region = frame[h - overlay_height:h, w - timestamp_width:w]
     
-    # Preprocess both regions
-    gray_gps = cv2.cvtColor(gps_region, cv2.COLOR_BGR2GRAY)
-    _, binary_gps = cv2.threshold(gray_gps, 127, 255, cv2.THRESH_BINARY)
+    return gps_region, timestamp_region
+
+
+def preprocess_overlay(frame: np.ndarray) -> tuple:
+    """
+    Crop and binarize the GPS (bottom-left) and timestamp (bottom-right) overlays
+    
+    Returns:
+        (binary_gps, binary_ts) images
+    """
+    gps_region, timestamp_region = overlay_regions(frame)
+    
+    # Preprocess both regions: the overlay is white text, so the green channel
+    # (largest luminance weight) stands in for grayscale, and Otsu picks the
+    # threshold per frame to follow exposure changes
+    gray_gps = gps_region[:, :, 1]
+    _, binary_gps = cv2.threshold(gray_gps, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    
+    gray_ts = timestamp_region[:, :, 1]
+    _, binary_ts = cv2.threshold(gray_ts, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    
+    return binary_gps, binary_ts
+
+
+def extract_gps_and_timestamp_from_frame(frame: np.ndarray, debug: bool = False) -> tuple:
+    """
+    Extract GPS coordinates and timestamp from VIOFO A119 V3 frame overlay
+    
+    Returns:
+        (latitude, longitude, heading, timestamp) tuple
+    """
+    binary_gps, binary_ts = preprocess_overlay(frame)
+    return ocr_overlay(binary_gps, binary_ts, debug=debug)
+
+
+def ocr_overlay(binary_gps: np.ndarray, binary_ts: np.ndarray, debug: bool = False) -> tuple:
+    """
+    OCR binarized overlay regions and parse GPS, speed and timestamp
     
-    gray_ts = cv2.cvtColor(timestamp_region, cv2.COLOR_BGR2GRAY)
-    _, binary_ts = cv2.threshold(gray_ts, 127, 255, cv2.THRESH_BINARY)
+    Returns:
+        (latitude, longitude, heading, timestamp) tuple
+    """
+    # Run OCR on both regions concurrently, in-process via tesserocr when
+    # available instead of spawning a tesseract subprocess per region
+    if tesserocr is not None:
+        fut_gps = _ocr_pool.submit(_tesserocr_text, binary_gps, GPS_OCR_WHITELIST)
+        fut_ts = _ocr_pool.submit(_tesserocr_text, binary_ts, TIMESTAMP_OCR_WHITELIST)
+    else:
+        try:
+            import pytesseract
+        except ImportError:
+            print("⚠️  pytesseract not installed")
+            return None, None, None, None
+        
+        fut_gps = _ocr_pool.submit(pytesseract.image_to_string, binary_gps, config=GPS_OCR_CONFIG)
+        fut_ts = _ocr_pool.submit(pytesseract.image_to_string, binary_ts, config=TIMESTAMP_OCR_CONFIG)
     
-    # Run OCR
-    gps_text = pytesseract.image_to_string(binary_gps, config='--psm 6')
-    timestamp_text = pytesseract.image_to_string(binary_ts, config='--psm 6')
+    gps_text = fut_gps.result()
+    timestamp_text = fut_ts.result()
     
     if debug:
         print(f"\n📝 GPS OCR: {gps_text.strip()}")
@@ -51,32 +155,26 @@ def extract_gps_and_timestamp_from_frame(frame: np.ndarray, debug: bool = False)
     lon = None
     heading = None
     
-    lat_match = re.search(r'[NS]\s*(\d+\.?\s*\d+)', gps_text, re.IGNORECASE)
+    lat_match = LAT_RE.search(gps_text)
     if lat_match:
         lat = float(lat_match.group(1).replace(' ', ''))
         if 'S' in lat_match.group(0).upper():
             lat = -abs(lat)
     
-    lon_match = re.search(r'[EW]\s*(\d+\.?\s*\d+)', gps_text, re.IGNORECASE)
+    lon_match = LON_RE.search(gps_text)
     if lon_match:
         lon = float(lon_match.group(1).replace(' ', ''))
         if 'W' in lon_match.group(0).upper():
             lon = -abs(lon)
     
-    speed_match = re.search(r'(\d+)\s*KM/H', gps_text, re.IGNORECASE)
+    speed_match = SPEED_RE.search(gps_text)
     if speed_match:
         heading = float(speed_match.group(1))
     
     # Parse timestamp
     timestamp = None
-    ts_patterns = [
-        r'(\d{2}/\d{2}/\d{4}\s+\d{2}:\d{2}:\d{2})',  # DD/MM/YYYY HH:MM:SS (VIOFO format)
-        r'(\d{4}[-/]\d{2}[-/]\d{2}\s+\d{2}:\d{2}:\d{2})',  # YYYY-MM-DD HH:MM:SS or YYYY/MM/DD HH:MM:SS
-        r'(\d{2}/\d{2}/\d{4})',  # DD/MM/YYYY (date only)
-        r'(\d{4}[-/]\d{2}[-/]\d{2})',  # YYYY-MM-DD or YYYY/MM/DD (date only)
-    ]
-    for pattern in ts_patterns:
-        match = re.search(pattern, timestamp_text)
+    for pattern in TIMESTAMP_RES:
+        match = pattern.search(timestamp_text)
         if match:
             timestamp = match.group(1)
             break
@@ -84,6 +182,62 @@ def extract_gps_and_timestamp_from_frame(frame: np.ndarray, debug: bool = False)
     return lat, lon, heading, timestamp
 
 
+class OverlayReader:
+    """
+    Overlay OCR that reuses the last result between overlay updates
+    
+    The VIOFO overlay text only changes about once per second, so at 30 FPS
+    most frames would OCR the same text. Tesseract runs at least every
+    max_reuse_frames frames, and earlier when the overlay glyphs change.
+    
+    Change detection looks only at glyph pixels (see GLYPH_LEVEL and
+    BACKGROUND_LEVEL) rather than the Otsu binaries, which are mostly road
+    scene. A region has changed when the pixels that appeared or vanished as
+    glyphs exceed change_threshold of its glyph pixel count, so the budget
+    scales with the text, not the crop. On a synthetic 1080p overlay one
+    changed digit flipped 1.5-3.5% of the glyph pixels, while unchanged text
+    over a moving scene flipped almost none.
+    """
+    
+    def __init__(self, max_reuse_frames: int = 30, change_threshold: float = 0.005,
+                 min_changed_pixels: int = 20):
+        self.max_reuse_frames = max_reuse_frames
+        self.change_threshold = change_threshold
+        self.min_changed_pixels = min_changed_pixels
+        self._last_levels = None
+        self._last_result = None
+        self._frames_reused = 0
+    
+    def _region_changed(self, last: np.ndarray, current: np.ndarray) -> bool:
+        if last.shape != current.shape:
+            return True
+        last_glyphs = last >= GLYPH_LEVEL
+        appeared = (current >= GLYPH_LEVEL) & (last < BACKGROUND_LEVEL)
+        vanished = last_glyphs & (current < BACKGROUND_LEVEL)
+        changed = np.count_nonzero(appeared) + np.count_nonzero(vanished)
+        budget = max(self.change_threshold * np.count_nonzero(last_glyphs), self.min_changed_pixels)
+        return changed > budget
+    
+    def read(self, frame: np.ndarray, debug: bool = False) -> tuple:
+        """Return (latitude, longitude, heading, timestamp) for a frame"""
+        # Green channel of each region, as in preprocess_overlay
+        levels = tuple(region[:, :, 1] for region in overlay_regions(frame))
+        
+        if (self._last_levels is not None
+                and self._frames_reused < self.max_reuse_frames
+                and not any(self._region_changed(last, current)
+                            for last, current in zip(self._last_levels, levels))):
+            self._frames_reused += 1
+            return self._last_result
+        
+        binary_gps, binary_ts = preprocess_overlay(frame)
+        # Copy: the regions are views into a frame the caller may reuse
+        self._last_levels = tuple(level.copy() for level in levels)
+        self._last_result = ocr_overlay(binary_gps, binary_ts, debug=debug)
+        self._frames_reused = 0
+        return self._last_result
+
+
 def main():
     # Test with video frame
     video_path = "/Users/boyangli/Repo/sentinel-map/data/videos/20260118191513_035087.MP4"
@@ -103,20 +257,35 @@ def main():
     print(f"\n📍 Testing first 3 frames:")
     print("-"*80)
     
+    # Re-OCR at least once per second of video
+    reader = OverlayReader(max_reuse_frames=max(1, int(fps)))
+    
+    results = []
+    elapsed_times = []
     for i in range(3):
         ret, frame = cap.read()
         if not ret:
             break
         
-        import time
-        start = time.time()
-        lat, lon, heading, timestamp = extract_gps_and_timestamp_from_frame(frame, debug=(i==0))
-        elapsed = time.time() - start
-        
-        ts_str = f"timestamp={timestamp}" if timestamp else "timestamp=None"
-        print(f"Frame {i}: lat={lat:.6f}, lon={lon:.6f}, heading={heading:.1f}, {ts_str} ({elapsed:.2f}s)")
+        start = time.perf_counter()
+        results.append(reader.read(frame, debug=(i==0)))
+        elapsed_times.append(time.perf_counter() - start)
     
     cap.release()
+    
+    # Format after the loop so printing doesn't skew the timings
+    nan = float('nan')
+    for i, (lat, lon, heading, timestamp) in enumerate(results):
+        lat = lat if lat is not None else nan
+        lon = lon if lon is not None else nan
+        heading = heading if heading is not None else nan
+        print(f"Frame {i}: lat={lat:.6f}, lon={lon:.6f}, heading={heading:.1f}, "
+              f"timestamp={timestamp} ({elapsed_times[i]:.2f}s)")
+    
+    if elapsed_times:
+        print(f"\n⏱️  OCR time per frame: min={min(elapsed_times):.3f}s, "
+              f"mean={sum(elapsed_times) / len(elapsed_times):.3f}s, "
+              f"max={max(elapsed_times):.3f}s")
     print("\n" + "="*80)
     print("✅ Test complete!")
     print("="*80)